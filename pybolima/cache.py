@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import pickle
+import sqlite3
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Callable, Union
+
+from loguru import logger
+
+from .stanza import ITagger, TaggedData
+
+# pylint: disable=too-many-arguments
+
+
+class CacheMissError(Exception):
+    ...
+
+
+@dataclass
+class CacheStats:
+    n_hits: int = 0
+    n_misses: int = 0
+    n_evicted: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        return self.n_hits / (self.n_hits + self.n_misses) if self.n_hits + self.n_misses else 0.0
+
+    def __str__(self) -> str:
+        return f"hits={self.n_hits} misses={self.n_misses} hit_ratio={self.hit_ratio:.3f} evicted={self.n_evicted}"
+
+
+class TaggedPageCache:
+    """Persistent store of tagged pages in a SQLite database, keyed by content hash.
+
+    If `max_size` (bytes of compressed data) is exceeded, least recently used pages are evicted
+    until the cache is at 90% of `max_size`.
+    """
+
+    CHUNK_SIZE: int = 500
+
+    def __init__(self, filename: str, max_size: int = None):
+        self.filename: str = filename
+        self.max_size: int = max_size
+        self.stats: CacheStats = CacheStats()
+        self.connection: sqlite3.Connection = sqlite3.connect(filename, timeout=60, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS pages "
+                "(key BLOB PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, used INTEGER NOT NULL)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS pages_used ON pages (used)")
+        self.size: int = self.stored_size()
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def stored_size(self) -> int:
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def get_many(self, keys: list[bytes]) -> dict[bytes, TaggedData]:
+        found: dict[bytes, TaggedData] = {}
+        for i in range(0, len(keys), self.CHUNK_SIZE):
+            chunk: list[bytes] = keys[i : i + self.CHUNK_SIZE]
+            rows: list[tuple[bytes, bytes]] = self.connection.execute(
+                f"SELECT key, data FROM pages WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            found.update((bytes(key), pickle.loads(zlib.decompress(data))) for key, data in rows)
+
+        if found:
+            used: int = time.time_ns()
+            with self.connection:
+                self.connection.executemany("UPDATE pages SET used = ? WHERE key = ?", [(used, key) for key in found])
+
+        return found
+
+    def put_many(self, items: dict[bytes, TaggedData]) -> None:
+        used: int = time.time_ns()
+        rows: list[tuple[bytes, bytes, int, int]] = []
+        for key, tagged_data in items.items():
+            data: bytes = zlib.compress(pickle.dumps(tagged_data, protocol=pickle.HIGHEST_PROTOCOL))
+            rows.append((key, data, len(data), used))
+
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO pages (key, data, size, used) VALUES (?, ?, ?, ?)", rows
+            )
+
+        self.size += sum(row[2] for row in rows)
+
+        if self.max_size and self.size > self.max_size:
+            self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used pages until size is below 90% of `max_size`."""
+        self.size = self.stored_size()
+        if self.size <= self.max_size:
+            return
+
+        excess: int = self.size - int(0.9 * self.max_size)
+        keys: list[bytes] = []
+        for key, size in self.connection.execute("SELECT key, size FROM pages ORDER BY used"):
+            if excess <= 0:
+                break
+            keys.append(key)
+            excess -= size
+
+        with self.connection:
+            self.connection.executemany("DELETE FROM pages WHERE key = ?", [(key,) for key in keys])
+
+        self.stats.n_evicted += len(keys)
+        self.size = self.stored_size()
+        logger.info(f"cache: evicted {len(keys)} pages from {self.filename}")
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class CachedTagger(ITagger):
+    """Tagger that looks up pages in a `TaggedPageCache` before tagging them with `tagger`.
+
+    Pages are keyed by a hash of the tagger's config and the preprocessed page text. If `tagger` is a
+    factory, it's called on first cache miss, so a run where all pages are cached never loads the model.
+    If `cache_only` is true, a cache miss raises `CacheMissError` instead.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        tagger: Union[ITagger, Callable[[], ITagger]] = None,
+        config: dict[str, Any] = None,
+        preprocessors: Callable[[str], str] = None,
+        max_segment_length: int = None,
+        max_size: int = None,
+        cache_only: bool = False,
+    ):
+        if isinstance(tagger, ITagger):
+            config = config or tagger.config
+            preprocessors = preprocessors or tagger.preprocessors
+            max_segment_length = max_segment_length or tagger.max_segment_length
+
+        if config is None:
+            raise ValueError("tagger config must be given if tagger is not an ITagger")
+
+        super().__init__(preprocessors=preprocessors, max_segment_length=max_segment_length)
+
+        self.tagger: Union[ITagger, Callable[[], ITagger]] = tagger
+        self.config: dict[str, Any] = config
+        self.cache_only: bool = cache_only
+        self.cache: TaggedPageCache = TaggedPageCache(filename, max_size=max_size)
+        self.namespace: bytes = hashlib.sha1(json.dumps(config, sort_keys=True).encode('utf-8')).digest()
+
+        if isinstance(tagger, ITagger):
+            self.stats = tagger.stats
+
+    @property
+    def cache_stats(self) -> CacheStats:
+        return self.cache.stats
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha1(self.namespace + text.encode('utf-8')).digest()
+
+    def get_tagger(self) -> ITagger:
+        if self.cache_only or self.tagger is None:
+            raise CacheMissError("page not in cache")
+        if not isinstance(self.tagger, ITagger):
+            self.tagger = self.tagger()
+            self.stats = self.tagger.stats
+        return self.tagger
+
+    def tag(self, text: Union[str, list[str]], preprocessed: bool = False) -> list[TaggedData]:
+        """Tag text. Pages found in cache are returned as is, other pages are tagged and added to cache."""
+        if isinstance(text, str):
+            text = [text]
+
+        if len(text) == 0:
+            return []
+
+        if not preprocessed and (self.preprocessors or self.max_segment_length):
+            text: list[str] = [self.preprocess(d) for d in text]
+
+        keys: list[bytes] = [self.key(d) for d in text]
+        found: dict[bytes, TaggedData] = self.cache.get_many(list(dict.fromkeys(keys)))
+        missing: dict[bytes, str] = {key: d for key, d in zip(keys, text) if key not in found}
+
+        self.cache.stats.n_misses += len(missing)
+        self.cache.stats.n_hits += len(keys) - len(missing)
+
+        if missing:
+            if self.cache_only or self.tagger is None:
+                raise CacheMissError(f"{len(missing)} page(s) not in cache")
+            tagged_data: dict[bytes, TaggedData] = dict(
+                zip(missing.keys(), self.get_tagger().tag(list(missing.values()), preprocessed=True))
+            )
+            self.cache.put_many(tagged_data)
+            found.update(tagged_data)
+
+        return [found[key] for key in keys]
+
+    def _tag(self, text: Union[str, list[str]]) -> list[TaggedData]:
+        return self.get_tagger().tag(text, preprocessed=True)
+
+    def _to_dict(self, tagged_document: Any) -> TaggedData:
+        return self.get_tagger()._to_dict(tagged_document)  # pylint: disable=protected-access
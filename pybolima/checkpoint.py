@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import os
+import pickle
+from typing import Any
+
+from loguru import logger
+
+
+class CheckpointJournal:
+    """Append-only journal of checkpoint records (one pickled dict per completed item).
+
+    Each record is flushed and synced to disk when appended. A record that was only partially
+    written (e.g. the process died while appending) is ignored and truncated when the journal is read.
+    """
+
+    def __init__(self, filename: str):
+        self.filename: str = filename
+        self.offsets: list[int] = []
+
+    def read(self) -> list[dict[str, Any]]:
+        """Return all complete records, and truncate journal after the last complete record."""
+        records: list[dict[str, Any]] = []
+        self.offsets = []
+
+        if not os.path.isfile(self.filename):
+            return records
+
+        with open(self.filename, 'rb') as fp:
+            while True:
+                try:
+                    records.append(pickle.load(fp))
+                    self.offsets.append(fp.tell())
+                except EOFError:
+                    break
+                except (pickle.UnpicklingError, ValueError, TypeError, AttributeError, IndexError) as ex:
+                    logger.warning(f"checkpoint: ignoring incomplete record in {self.filename} ({ex})")
+                    break
+
+        self.truncate(len(records))
+        return records
+
+    def append(self, record: dict[str, Any]) -> None:
+        with open(self.filename, 'ab') as fp:
+            pickle.dump(record, fp, protocol=pickle.HIGHEST_PROTOCOL)
+            fp.flush()
+            os.fsync(fp.fileno())
+
+    def truncate(self, n_records: int) -> None:
+        """Keep the first `n_records` records (as found by last `read`)."""
+        size: int = self.offsets[n_records - 1] if n_records > 0 else 0
+        del self.offsets[n_records:]
+        if os.path.isfile(self.filename) and os.path.getsize(self.filename) > size:
+            with open(self.filename, 'r+b') as fp:
+                fp.truncate(size)
+
+    def remove(self) -> None:
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
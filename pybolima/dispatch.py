@@ -1,32 +1,101 @@
 from __future__ import annotations
 
+import io
 import os
+import threading
+import zipfile
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Any, Literal
+from glob import glob
+from typing import Any, Callable, Literal, Type
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from loguru import logger
 
+from .checkpoint import CheckpointJournal
 from .foss.pos_tags import PoS_Tag_Scheme, PoS_TAGS_SCHEMES
 from .foss.stopwords import STOPWORDS
-from .interface import TaggedIssue
+from .interface import ARCHIVE_FILENAME, DATASET_FOLDER, RAW_TITLES_FILENAME, CompressType, TaggedIssue
+from .pipeline import TaskQueue
 from .utility import replace_extension, store_str, trim_series_type
+from .vocabulary import Vocabulary
 
 jj = os.path.join
 
+CHECKPOINT_FILENAME: str = 'checkpoint.pickle'
+DOCUMENT_INDEX_STREAM: str = 'document_index.{}.arrows'
+
 
 @dataclass
 class DispatchOptions:
-    compress_type: Literal['feather', 'csv', 'gzip', 'bz2', 'lzma'] = 'feather'
+    compress_type: Literal['feather', 'csv', 'gzip', 'bz2', 'lzma', 'zstd', 'lz4', 'parquet', 'zip'] = 'feather'
     to_lower: bool = True
     skip_text: bool = True
     skip_stopwords: bool = False
     skip_puncts: bool = True
     skip_lemma: bool = False
+    checkpoint: bool = False
+    resume: bool = False
+    row_group_size: int = None
+    zip_compression: Literal['csv', 'zip', 'bz2', 'lzma'] = 'zip'
+    compress_level: int = None
+    compress_threads: int = 1
+    feather_compression: Literal['zstd', 'lz4', 'uncompressed'] = None
+    write_threads: int = 0
+    write_queue_size: int = 8
+    vocabulary: str = None
+
+
+PADS: set[str] = {'MID', 'MAD', 'PAD'}
+
+
+def lowercase(values: np.ndarray, fillna: str = None) -> np.ndarray:
+    """Lowercase array of strings (NaN kept, or replaced with `fillna`)."""
+    lowered: pd.Series = pd.Series(values, dtype=object).str.lower()
+    if fillna is not None:
+        lowered = lowered.fillna(fillna)
+    return lowered.to_numpy(dtype=object)
+
+
+def to_categorical(codes: np.ndarray, uniques: np.ndarray) -> pd.Categorical:
+    """Dictionary encode `uniques[codes]`. Duplicate `uniques` (e.g. after lowercasing) share category."""
+    unique_codes, categories = pd.factorize(uniques, sort=False)
+    return pd.Categorical.from_codes(unique_codes[codes], categories=categories)
+
+
+def to_int32(values: np.ndarray) -> np.ndarray:
+    """Narrow integer ids to int32 if they fit."""
+    if len(values) == 0 or values.max() <= np.iinfo(np.int32).max:
+        return values.astype(np.int32, copy=False)
+    return values
+
+
+def grow(counts: np.ndarray, size: int) -> np.ndarray:
+    """Return int64 `counts` zero-padded to at least `size` elements (capacity is doubled to amortize growth)."""
+    if counts is None:
+        counts = np.zeros(0, dtype=np.int64)
+    if len(counts) >= size:
+        return counts
+    return np.concatenate([counts, np.zeros(max(size, 2 * len(counts)) - len(counts), dtype=np.int64)])
+
+
+def factorize(values: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """Return codes and uniques of `values`, uniques in order of first appearance (NaN included)."""
+    try:
+        return pd.factorize(values, sort=False, use_na_sentinel=False)
+    except TypeError:  # pandas < 1.5
+        return pd.factorize(values, sort=False, na_sentinel=None)
 
 
 class TaggedFramePerGroupDispatcher:
+
+    keep_xpos: bool = False
+    max_write_threads: int = None
+    keep_checkpoint: bool = False
+
     def __init__(self, *, target: str, opts: DispatchOptions):
         """Dispatches text blocks to target zink.
 
@@ -36,43 +105,212 @@ class TaggedFramePerGroupDispatcher:
         """
         self.target: str = target
         self.document_id: int = 0
-        self.issue_indexes: list[pd.DataFrame] = []
+        self.index_writer: pa.RecordBatchStreamWriter = None
+        self.index_schema: pa.Schema = None
+        self.n_index_streams: int = 0
         self.opts: DispatchOptions = opts
+        self.journal: CheckpointJournal = None
+        self.completed: set[str] = set()
+        self.writer: TaskQueue = None
+        self.lock: threading.Lock = threading.Lock()
+        self.n_dispatched: int = 0
+        self.n_journaled: int = 0
+        self.stored_states: dict[int, dict[str, Any]] = {}
 
     def __enter__(self) -> "TaggedFramePerGroupDispatcher":
         self.open_target(self.target)
         return self
 
     def __exit__(self, _type, _value, _traceback):  # pylint: disable=unused-argument
+        if _type is not None:
+            self.close_writer(raise_error=False)
         self.close_target()
+        if _type is None:
+            self.close_checkpoint()
         return False
 
     def open_target(self, target: Any) -> None:
         os.makedirs(target, exist_ok=True)
+        self.open_index()
+        self.open_checkpoint()
+        self.open_writer()
 
     def close_target(self) -> None:
+        self.close_writer()
         self.dispatch_index()
 
+    def open_index(self) -> None:
+        """Remove document index streams left by an interrupted run (they're replayed from checkpoint on resume)."""
+        for filename in glob(jj(self.target, DOCUMENT_INDEX_STREAM.format('*'))):
+            os.remove(filename)
+
+    def open_writer(self) -> None:
+        """Start background writer threads if `opts.write_threads` > 0."""
+        if self.opts.write_threads <= 0:
+            return
+        self.writer = TaskQueue(
+            maxsize=self.opts.write_queue_size,
+            workers=min(self.opts.write_threads, self.max_write_threads or self.opts.write_threads),
+            name="store",
+        )
+
+    def raise_write_error(self) -> None:
+        """Raise first error of background writes (if any), which stops the run."""
+        if self.writer is not None:
+            self.writer.raise_error()
+
+    def close_writer(self, raise_error: bool = True) -> None:
+        """Wait for pending writes and stop writer threads. Raises first write error (if any)."""
+        if self.writer is None:
+            return
+        writer, self.writer = self.writer, None
+        try:
+            writer.close(raise_error=raise_error)
+        finally:
+            logger.info(f"store: {writer.stats}")
+
+    def open_checkpoint(self) -> None:
+        """Open checkpoint journal. If resuming, restore state of issues having valid stored output."""
+        if not (self.opts.checkpoint or self.opts.resume):
+            return
+
+        self.journal = CheckpointJournal(jj(self.target, CHECKPOINT_FILENAME))
+
+        if not self.opts.resume:
+            self.journal.remove()
+            return
+
+        records: list[dict[str, Any]] = self.journal.read()
+        n_restored: int = 0
+        for record in records:
+            if not all(self.is_stored(jj(self.target, filename)) for filename in record['filenames']):
+                logger.warning(f"resume: output of {record['title']} is missing or invalid, re-tagging from there")
+                break
+            self.restore_state(record)
+            n_restored += 1
+
+        if n_restored < len(records):
+            self.journal.truncate(n_restored)
+
+        logger.info(f"resume: {n_restored} issues already dispatched")
+
+    def close_checkpoint(self) -> None:
+        """Remove checkpoint journal of a completed run (unless `keep_checkpoint`), since it's only needed to resume."""
+        if self.journal is not None and not self.keep_checkpoint:
+            self.journal.remove()
+
+    def checkpoint_state(self, tagged_issue: TaggedIssue) -> dict[str, Any]:
+        """Returns state needed to restore dispatcher as it is after `tagged_issue` has been dispatched."""
+        return {
+            'title': tagged_issue.title,
+            'document_index': tagged_issue.document_index,
+            'document_id': self.document_id,
+        }
+
+    def restore_state(self, record: dict[str, Any]) -> None:
+        self.write_index_item(record['document_index'])
+        self.document_id = record['document_id']
+        self.completed.add(record['title'])
+
+    def is_stored(self, filename: str) -> bool:
+        """True if `filename` exists and (if feather) is completely written."""
+        if not os.path.isfile(filename) or os.path.getsize(filename) == 0:
+            return False
+        if filename.endswith('.feather'):
+            with open(filename, 'rb') as fp:
+                fp.seek(-6, os.SEEK_END)
+                return fp.read(6) == b'ARROW1'
+        return True
+
     def dispatch(self, tagged_issue: TaggedIssue) -> None:
+        self.raise_write_error()
         tagged_frame: pd.DataFrame = self.process(tagged_issue)
-        filename: str = jj(self.target, tagged_issue.filename)
-        self.store(filename=filename, data=tagged_frame)
         self.dispatch_index_item(tagged_issue)
+        self.write_issue(tagged_issue, [(jj(self.target, tagged_issue.filename), tagged_frame)])
+
+    def write_issue(
+        self,
+        tagged_issue: TaggedIssue,
+        items: list[tuple[str, pd.DataFrame]],
+        store: Callable[[str, pd.DataFrame], str] = None,
+    ) -> None:
+        """Store `items` (filename, data) of `tagged_issue` using `store`, then checkpoint the issue.
+
+        If `opts.write_threads` > 0, items are stored by background writer threads, and this call
+        only blocks when `opts.write_queue_size` issues are waiting to be written. Checkpoint state
+        is taken now, but journaled only when the issue and all previously dispatched issues are stored.
+        """
+        state: dict[str, Any] = self.checkpoint_state(tagged_issue) if self.journal is not None else None
+        sequence: int = self.n_dispatched
+        self.n_dispatched += 1
+
+        if self.writer is None:
+            self.store_items(sequence, state, items, store or self.store)
+        else:
+            self.writer.submit(self.store_items, sequence, state, items, store or self.store)
+
+    def store_items(
+        self,
+        sequence: int,
+        state: dict[str, Any],
+        items: list[tuple[str, pd.DataFrame]],
+        store: Callable[[str, pd.DataFrame], str],
+    ) -> None:
+        filenames: list[str] = [store(filename, data) for filename, data in items]
+        if state is not None:
+            state['filenames'] = [os.path.basename(filename) for filename in filenames]
+            self.checkpoint(sequence, state)
+
+    def checkpoint(self, sequence: int, state: dict[str, Any]) -> None:
+        """Journal states of stored issues in dispatch order (`sequence`)."""
+        with self.lock:
+            self.stored_states[sequence] = state
+            while self.n_journaled in self.stored_states:
+                self.journal.append(self.stored_states.pop(self.n_journaled))
+                self.n_journaled += 1
 
     def dispatch_index_item(self, tagged_issue: TaggedIssue) -> None:
         """Default one document per group"""
         tagged_issue.document_index["document_id"] += self.document_id
         tagged_issue.tagged_frame['document_id'] += self.document_id
+        self.write_index_item(tagged_issue.document_index)
         self.document_id += len(tagged_issue.document_index)
-        self.issue_indexes.append(tagged_issue.document_index)
+
+    def write_index_item(self, document_index: pd.DataFrame) -> None:
+        """Append issue's document index to an Arrow IPC stream in target folder.
+
+        If the index's columns or types differ from previous issue's (e.g. a column that is all NaN in
+        one issue), a new stream is started. Streams are concatenated as frames when compacted.
+        """
+        table: pa.Table = pa.Table.from_pandas(document_index, preserve_index=False)
+        if self.index_writer is not None and not table.schema.equals(self.index_schema):
+            self.index_writer.close()
+            self.index_writer = None
+        if self.index_writer is None:
+            self.index_schema = table.schema
+            self.index_writer = pa.ipc.new_stream(self.index_stream_filename(self.n_index_streams), table.schema)
+            self.n_index_streams += 1
+        self.index_writer.write_table(table)
+
+    def index_stream_filename(self, i: int) -> str:
+        return jj(self.target, DOCUMENT_INDEX_STREAM.format(i))
 
     def dispatch_index(self) -> None:
-        """Write index of documents to disk."""
+        """Compact streamed document index into index of documents on disk, then remove the streams."""
 
-        if len(self.issue_indexes) == 0:
+        if self.index_writer is None:
             return
 
-        di: pd.DataFrame = pd.concat(self.issue_indexes)
+        self.index_writer.close()
+        self.index_writer = None
+
+        issue_indexes: list[pd.DataFrame] = []
+        for i in range(self.n_index_streams):
+            with pa.OSFile(self.index_stream_filename(i)) as source:
+                issue_indexes.append(pa.ipc.open_stream(source).read_all().to_pandas())
+
+        di: pd.DataFrame = pd.concat(issue_indexes)
+
         di.rename({'num_tokens': 'n_tokens'}, inplace=True, errors='ignore')
 
         di['year'] = trim_series_type(di.year)
@@ -82,8 +320,12 @@ class TaggedFramePerGroupDispatcher:
         di.reset_index(drop=True, inplace=True)
         self.store(filename=jj(self.target, 'document_index.csv'), data=di)
 
-    def store(self, filename: str, data: str | pd.DataFrame) -> None:
-        """Store text to file."""
+        for i in range(self.n_index_streams):
+            os.remove(self.index_stream_filename(i))
+        self.n_index_streams = 0
+
+    def store(self, filename: str, data: str | pd.DataFrame) -> str:
+        """Store text to file. Returns name of stored file."""
 
         if not os.path.split(filename)[0]:
             filename = jj(self.target, f"{filename}")
@@ -91,88 +333,393 @@ class TaggedFramePerGroupDispatcher:
         if isinstance(data, pd.DataFrame):
 
             if self.opts.compress_type == 'feather':
-                data.to_feather(replace_extension(filename, 'feather'))
-                return
+                filename = replace_extension(filename, 'feather')
+                data.to_feather(filename, **self.feather_args())
+                return filename
 
             data = data.to_csv(sep='\t')
 
-        if isinstance(data, str):
-            store_str(filename=filename, text=data, compress_type=self.opts.compress_type)
+        return store_str(
+            filename=filename,
+            text=data,
+            compress_type=self.opts.compress_type,
+            level=self.opts.compress_level,
+            threads=self.opts.compress_threads,
+        )
+
+    def feather_args(self) -> dict[str, Any]:
+        """Feather compression (Arrow's default, lz4, if not set). Arrow compresses columns in parallel."""
+        args: dict[str, Any] = {}
+        if self.opts.feather_compression:
+            args['compression'] = self.opts.feather_compression
+        if self.opts.compress_level is not None and self.opts.feather_compression != 'uncompressed':
+            args['compression_level'] = self.opts.compress_level
+        return args
 
     def process(self, item: TaggedIssue) -> pd.DataFrame:
+        """Lowercase, filter and drop columns in one pass over the tagged frame.
 
-        pads: set = {'MID', 'MAD', 'PAD'}
+        Strings are factorized so that each unique token and lemma is lowercased (and stopword
+        tested) once. One keep-mask is built from stopwords and delimiters (PAD/MID/MAD), and each
+        kept column is gathered once into a new frame. The item's frame isn't changed.
 
-        tagged_frame: pd.DataFrame = item.tagged_frame.copy()
-        tagged_frame['document_id'] += self.document_id
+        String columns are returned dictionary encoded (categorical), and `document_id` as int32.
+        """
+        tagged_frame: pd.DataFrame = item.tagged_frame
+        keep: np.ndarray = np.ones(len(tagged_frame), dtype=bool)
 
-        if self.opts.to_lower:
-            tagged_frame["token"] = tagged_frame["token"].str.lower()
-            tagged_frame["lemma"] = tagged_frame["lemma"].str.lower()
+        if not self.opts.skip_text or self.opts.skip_stopwords:
+            token_codes, tokens = factorize(tagged_frame['token'])
+            if self.opts.skip_stopwords or self.opts.to_lower:
+                lowered_tokens: np.ndarray = lowercase(tokens)
 
-        drop_columns: list[str] = []
+        if self.opts.skip_stopwords:
+            keep &= ~pd.Index(lowered_tokens).isin(STOPWORDS)[token_codes]
 
-        if 'xpos' in tagged_frame.columns:
-            drop_columns.append('xpos')
+        if self.opts.skip_puncts:
+            pos_codes, pos = factorize(tagged_frame['pos'])
+            keep &= ~pd.Index(pos).isin(PADS)[pos_codes]
 
-        if self.opts.skip_stopwords and self.opts.skip_puncts:
-            tagged_frame = tagged_frame[
-                ~(tagged_frame["token"].str.lower().isin(STOPWORDS) | tagged_frame["pos"].isin(pads))
-            ]
-        else:
-            if self.opts.skip_stopwords:
-                tagged_frame = tagged_frame[~tagged_frame["token"].str.lower().isin(STOPWORDS)]
-            if self.opts.skip_puncts:
-                tagged_frame = tagged_frame[~tagged_frame["pos"].isin(pads)]
-
-        if self.opts.skip_text:
-            drop_columns.append('token')
-        elif self.opts.to_lower:
-            tagged_frame['token'] = tagged_frame['token'].str.lower()
-
-        if self.opts.skip_lemma:
-            drop_columns.append('lemma')
-        elif self.opts.to_lower:
-            tagged_frame['lemma'] = tagged_frame['lemma'].str.lower().fillna('')
-            assert not tagged_frame.lemma.isna().any(), "YOU SHALL UPDATE LEMMA FROM TEXT"
-
-        tagged_frame = tagged_frame.drop(columns=drop_columns)
-        tagged_frame = tagged_frame.reset_index(drop=True)
-        return tagged_frame
+        indices: np.ndarray = np.flatnonzero(keep)
+
+        data: dict[str, np.ndarray] = {}
+        for column in tagged_frame.columns:
+
+            if column == 'xpos':
+                continue
+
+            if column == 'token':
+                if not self.opts.skip_text:
+                    data[column] = to_categorical(
+                        token_codes[indices], lowered_tokens if self.opts.to_lower else tokens
+                    )
+                continue
+
+            if column == 'lemma':
+                if not self.opts.skip_lemma:
+                    lemma_codes, lemmas = factorize(tagged_frame['lemma'])
+                    if self.opts.to_lower:
+                        lemmas = lowercase(lemmas, fillna='')
+                    data[column] = to_categorical(lemma_codes[indices], lemmas)
+                continue
+
+            if column == 'pos':
+                if not self.opts.skip_puncts:
+                    pos_codes, pos = factorize(tagged_frame['pos'])
+                data[column] = to_categorical(pos_codes[indices], pos)
+                continue
+
+            values: np.ndarray = tagged_frame[column].to_numpy()[indices]
+            data[column] = to_int32(values + self.document_id) if column == 'document_id' else values
+
+        return pd.DataFrame(data=data, columns=list(data.keys()))
 
 
 class IdTaggedFramePerGroupDispatcher(TaggedFramePerGroupDispatcher):
+    """Stores tagged frames with tokens, lemmas and PoS tags encoded as ids.
+
+    If `opts.vocabulary` is set, the vocabulary is loaded from (and extended in) this persistent
+    vocabulary (see `Vocabulary`), so that ids are comparable between runs. New tokens are appended
+    to it as each issue is dispatched.
+
+    Corpus term and document frequencies of token and lemma ids are counted as issues are processed,
+    and stored in `term_frequencies` (columns `token_tf`, `token_df`, `lemma_tf`, `lemma_df`) next to `token2id`.
+    """
+
     def __init__(self, target: str, opts: DispatchOptions):
         super().__init__(target=target, opts=opts)
-        self.token2id: defaultdict = defaultdict()
-        self.tfs: defaultdict = defaultdict()
-        self.token2id.default_factory = self.token2id.__len__
+        self.vocabulary: Vocabulary = Vocabulary.load(opts.vocabulary) if opts.vocabulary else Vocabulary()
+        self.tfs: dict[str, np.ndarray] = {}
+        self.dfs: dict[str, np.ndarray] = {}
+        self.issue_frequencies: dict[str, tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
         self.pos_schema: PoS_Tag_Scheme = PoS_TAGS_SCHEMES.SUC
+        self.n_checkpointed_tokens: int = len(self.vocabulary)
+
+    @property
+    def token2id(self) -> dict[str, int]:
+        return self.vocabulary.token2id
 
     def process(self, item: TaggedIssue) -> pd.DataFrame:
         tagged_frame: pd.DataFrame = super().process(item)
-        fg = lambda t: self.token2id[t]
-        pg = self.pos_schema.pos_to_id.get
 
         if not self.opts.skip_text:
-            tagged_frame['token_id'] = tagged_frame.token.apply(fg)
+            tagged_frame['token_id'] = self.encode(tagged_frame.token)
 
         if not self.opts.skip_lemma:
-            tagged_frame['lemma_id'] = tagged_frame.lemma.apply(fg)
+            tagged_frame['lemma_id'] = self.encode(tagged_frame.lemma)
 
-        tagged_frame['pos_id'] = tagged_frame.pos.apply(pg).astype(np.int8)
+        tagged_frame['pos_id'] = self.encode_pos(tagged_frame.pos)
         tagged_frame.drop(columns=['lemma', 'token', 'pos'], inplace=True, errors='ignore')
+
+        self.issue_frequencies = {
+            name: self.count(tagged_frame[f'{name}_id'].to_numpy(), tagged_frame['document_id'].to_numpy())
+            for name in ['token', 'lemma']
+            if f'{name}_id' in tagged_frame.columns
+        }
+        for name, (ids, tf, df) in self.issue_frequencies.items():
+            self.add_frequencies(name, ids, tf, df)
+
         return tagged_frame
 
+    def count(self, ids: np.ndarray, document_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns ids occurring in an issue, with their term and document frequencies in the issue."""
+        tf: np.ndarray = np.bincount(ids)
+        pairs: np.ndarray = np.unique((document_ids.astype(np.int64) << 32) | ids.astype(np.int64))
+        df: np.ndarray = np.bincount(pairs & 0xFFFFFFFF, minlength=len(tf))
+        terms: np.ndarray = np.flatnonzero(tf)
+        return terms, tf[terms], df[terms]
+
+    def add_frequencies(self, name: str, ids: np.ndarray, tf: np.ndarray, df: np.ndarray) -> None:
+        """Add frequencies of (unique) `ids` to corpus frequencies of `name` (token or lemma)."""
+        self.tfs[name] = grow(self.tfs.get(name), len(self.vocabulary))
+        self.dfs[name] = grow(self.dfs.get(name), len(self.vocabulary))
+        self.tfs[name][ids] += tf
+        self.dfs[name][ids] += df
+
+    def encode(self, values: pd.Series) -> np.ndarray:
+        """Return vocabulary ids (int32) of `values`. Unseen values are added to vocabulary in first-seen order.
+        Missing values (NaN, None) are encoded as the empty string."""
+        codes, uniques = factorize(values)
+        uniques = np.where(pd.isna(uniques), '', uniques)
+        return to_int32(self.vocabulary.encode(uniques))[codes]
+
+    def encode_pos(self, values: pd.Series) -> np.ndarray:
+        codes, uniques = factorize(values)
+        pos_ids: list[int] = [self.pos_schema.pos_to_id.get(u) for u in uniques]
+        if None in pos_ids:
+            raise ValueError(f"unknown PoS tag(s): {[u for u, i in zip(uniques, pos_ids) if i is None]}")
+        return np.array(pos_ids, dtype=np.int8)[codes]
+
+    def checkpoint_state(self, tagged_issue: TaggedIssue) -> dict[str, Any]:
+        """Adds tokens added to the vocabulary since previous checkpoint"""
+        state: dict[str, Any] = super().checkpoint_state(tagged_issue)
+        state['tokens'] = self.vocabulary.tokens(self.n_checkpointed_tokens)
+        state['frequencies'] = self.issue_frequencies
+        self.n_checkpointed_tokens = len(self.vocabulary)
+        return state
+
+    def restore_state(self, record: dict[str, Any]) -> None:
+        super().restore_state(record)
+        self.vocabulary.encode(record['tokens'])
+        for name, (ids, tf, df) in record['frequencies'].items():
+            self.add_frequencies(name, ids, tf, df)
+        self.n_checkpointed_tokens = len(self.vocabulary)
+
+    def dispatch_index_item(self, tagged_issue: TaggedIssue) -> None:
+        super().dispatch_index_item(tagged_issue)
+        if self.opts.vocabulary:
+            self.vocabulary.save()
+
     def dispatch_index(self) -> None:
         super().dispatch_index()
         self.dispatch_vocabulary()
 
     def dispatch_vocabulary(self) -> None:
+        if self.opts.vocabulary:
+            self.vocabulary.save()
         vocabulary: pd.DataFrame = pd.DataFrame(
             data={
-                'token': self.token2id.keys(),
-                'token_id': self.token2id.values(),
+                'token': self.vocabulary.tokens(),
+                'token_id': np.arange(len(self.vocabulary)),
             }
         )
         self.store(filename=jj(self.target, 'token2id.csv'), data=vocabulary)
+        self.dispatch_frequencies()
+
+    def dispatch_frequencies(self) -> None:
+        """Write corpus term and document frequencies (zero for ids not seen in this run) of each vocabulary id."""
+        if not self.tfs:
+            return
+        n_tokens: int = len(self.vocabulary)
+        data: dict[str, np.ndarray] = {'token_id': np.arange(n_tokens)}
+        for name in self.tfs:
+            data[f'{name}_tf'] = grow(self.tfs[name], n_tokens)[:n_tokens]
+            data[f'{name}_df'] = grow(self.dfs[name], n_tokens)[:n_tokens]
+        self.store(filename=jj(self.target, 'term_frequencies.csv'), data=pd.DataFrame(data=data))
+
+
+class RawTaggedFrameDispatcher(TaggedFramePerGroupDispatcher):
+    """Stores unprocessed tagged frames (including `xpos`) and document index of each issue.
+
+    Each issue is stored as two zstd compressed feather files, with page local document ids.
+    Titles are listed in dispatch order in `titles.txt`. The store is read by `load.raw_issue_reader`,
+    and can be dispatched with other dispatchers and options without re-tagging.
+
+    The checkpoint journal is kept when the run completes, since later runs resume from it to skip
+    issues already in the store.
+    """
+
+    keep_xpos: bool = True
+    keep_checkpoint: bool = True
+
+    def __init__(self, *, target: str, opts: DispatchOptions = None):
+        super().__init__(target=target, opts=opts or DispatchOptions())
+        self.titles: list[str] = []
+
+    def close_target(self) -> None:
+        self.close_writer()
+        with open(jj(self.target, RAW_TITLES_FILENAME), 'w', encoding='utf-8') as fp:
+            fp.write(''.join(f"{title}\n" for title in self.titles))
+
+    def dispatch(self, tagged_issue: TaggedIssue) -> None:
+        self.raise_write_error()
+        self.write_issue(
+            tagged_issue,
+            [
+                (jj(self.target, tagged_issue.filename), tagged_issue.tagged_frame),
+                (jj(self.target, tagged_issue.index_name), tagged_issue.document_index),
+            ],
+            store=self.store_raw,
+        )
+        self.titles.append(tagged_issue.title)
+
+    def store_raw(self, filename: str, data: pd.DataFrame) -> str:
+        filename = replace_extension(filename, 'feather')
+        data.reset_index(drop=True).to_feather(filename, compression='zstd')
+        return filename
+
+    def checkpoint_state(self, tagged_issue: TaggedIssue) -> dict[str, Any]:
+        return {'title': tagged_issue.title}
+
+    def restore_state(self, record: dict[str, Any]) -> None:
+        self.titles.append(record['title'])
+        self.completed.add(record['title'])
+
+
+class PartitionedDatasetMixIn:
+    """Streams tagged frames of all issues into one Parquet dataset, instead of one file per issue.
+
+    The dataset is stored in `tagged_frames`, hive partitioned by year (one file per year), with one
+    row group per issue, or, if `opts.row_group_size` is set, row groups of at least this many rows.
+    All files share one schema (int32 ids, int8 `pos_id`, dictionary encoded strings). Document index
+    and vocabulary are stored as Parquet files in target folder. Use `load.read_tagged_dataset` to read.
+
+    Since a Parquet file is readable only when closed, runs can't be checkpointed or resumed.
+    """
+
+    def open_target(self, target: Any) -> None:
+        super().open_target(target)
+        self.schema: pa.Schema = None
+        self.writers: dict[int, pq.ParquetWriter] = {}
+        self.buffers: dict[int, list[pa.Table]] = defaultdict(list)
+
+    def open_checkpoint(self) -> None:
+        if self.opts.resume:
+            raise ValueError("resume is not supported for partitioned datasets")
+
+    def close_target(self) -> None:
+        for year in list(self.buffers):
+            self.flush(year)
+        for writer in self.writers.values():
+            writer.close()
+        super().close_target()
+
+    def dispatch(self, tagged_issue: TaggedIssue) -> None:
+        tagged_frame: pd.DataFrame = self.process(tagged_issue)
+        self.write(int(tagged_issue.document_index['year'].iloc[0]), tagged_frame)
+        self.dispatch_index_item(tagged_issue)
+
+    def write(self, year: int, tagged_frame: pd.DataFrame) -> None:
+        table: pa.Table = pa.Table.from_pandas(tagged_frame, preserve_index=False)
+
+        if self.schema is None:
+            self.schema = normalized_schema(table.schema)
+
+        self.buffers[year].append(table.cast(self.schema))
+
+        if sum(len(x) for x in self.buffers[year]) >= (self.opts.row_group_size or 0):
+            self.flush(year)
+
+    def flush(self, year: int) -> None:
+        tables: list[pa.Table] = self.buffers.pop(year, [])
+        if not tables:
+            return
+        if year not in self.writers:
+            folder: str = jj(self.target, DATASET_FOLDER, f"year={year}")
+            os.makedirs(folder, exist_ok=True)
+            self.writers[year] = pq.ParquetWriter(jj(folder, 'part-0.parquet'), self.schema, compression='zstd')
+        table: pa.Table = pa.concat_tables(tables)
+        self.writers[year].write_table(table, row_group_size=max(1, len(table)))
+
+    def store(self, filename: str, data: str | pd.DataFrame) -> str:
+        if not isinstance(data, pd.DataFrame):
+            return super().store(filename, data)
+        filename = replace_extension(filename, 'parquet')
+        data.to_parquet(filename, index=False)
+        return filename
+
+
+def normalized_schema(schema: pa.Schema) -> pa.Schema:
+    """Schema without pandas metadata, with int32 indexed string dictionaries."""
+    return pa.schema(
+        [
+            pa.field(field.name, pa.dictionary(pa.int32(), pa.string()))
+            if pa.types.is_dictionary(field.type)
+            else field
+            for field in schema
+        ]
+    )
+
+
+class PartitionedDatasetDispatcher(PartitionedDatasetMixIn, TaggedFramePerGroupDispatcher):
+    ...
+
+
+class IdPartitionedDatasetDispatcher(PartitionedDatasetMixIn, IdTaggedFramePerGroupDispatcher):
+    ...
+
+
+class ZipArchiveMixIn:
+    """Streams tagged frames of all issues, document index and vocabulary into one Zip archive.
+
+    The archive `tagged_frames.zip` is stored in target folder. Members are written as TSV (same
+    names as for folder output) directly into the archive, compressed as given by `opts.zip_compression`
+    (see `CompressType.to_zipfile_compression`). Use `load.TaggedArchive` to read. Since a Zip archive is
+    readable only when closed, runs can't be checkpointed or resumed. Members are written one at a
+    time, so at most one writer thread is used.
+    """
+
+    max_write_threads: int = 1
+
+    def open_target(self, target: Any) -> None:
+        super().open_target(target)
+        self.archive: zipfile.ZipFile = zipfile.ZipFile(
+            jj(target, ARCHIVE_FILENAME),
+            mode='w',
+            compression=CompressType(self.opts.zip_compression).to_zipfile_compression(),
+        )
+
+    def open_checkpoint(self) -> None:
+        if self.opts.resume:
+            raise ValueError("resume is not supported for zip archives")
+
+    def close_target(self) -> None:
+        super().close_target()
+        self.archive.close()
+
+    def store(self, filename: str, data: str | pd.DataFrame) -> str:
+        """Store text or frame (as TSV) as archive member `basename(filename)`."""
+        member: str = os.path.basename(filename)
+        with self.archive.open(member, mode='w', force_zip64=True) as fp:
+            with io.TextIOWrapper(fp, encoding='utf-8', newline='') as text_fp:
+                if isinstance(data, pd.DataFrame):
+                    data.to_csv(text_fp, sep='\t')
+                else:
+                    text_fp.write(data)
+        return member
+
+
+class ZipArchiveDispatcher(ZipArchiveMixIn, TaggedFramePerGroupDispatcher):
+    ...
+
+
+class IdZipArchiveDispatcher(ZipArchiveMixIn, IdTaggedFramePerGroupDispatcher):
+    ...
+
+
+def get_dispatcher_class(numeric_frame: bool, compress_type: str = 'feather') -> Type[TaggedFramePerGroupDispatcher]:
+    if compress_type == 'parquet':
+        return IdPartitionedDatasetDispatcher if numeric_frame else PartitionedDatasetDispatcher
+    if compress_type == 'zip':
+        return IdZipArchiveDispatcher if numeric_frame else ZipArchiveDispatcher
+    return IdTaggedFramePerGroupDispatcher if numeric_frame else TaggedFramePerGroupDispatcher
@@ -7,6 +7,11 @@ from os.path import join as jj
 
 import pandas as pd
 
+RAW_TITLES_FILENAME: str = 'titles.txt'
+RAW_STORE_FILENAME: str = 'store.json'
+DATASET_FOLDER: str = 'tagged_frames'
+ARCHIVE_FILENAME: str = 'tagged_frames.zip'
+
 
 @dataclass
 class TaggedIssue:
@@ -56,7 +61,10 @@ class CompressType(str, Enum):
     Gzip = 'gzip'
     Bz2 = 'bz2'
     Lzma = 'lzma'
+    Zstd = 'zstd'
+    Lz4 = 'lz4'
     Feather = 'feather'
+    Parquet = 'parquet'
 
     def to_zipfile_compression(self):
         if self.value == "csv":
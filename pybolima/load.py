@@ -1,35 +1,88 @@
 from __future__ import annotations
 
+import glob
+import hashlib
+import io
+import os
+import zipfile
 from typing import Iterable
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+import pyarrow.fs as pa_fs
+from pandas._libs.parsers import STR_NA_VALUES
 from tqdm import tqdm
 
+from .interface import ARCHIVE_FILENAME, DATASET_FOLDER, RAW_TITLES_FILENAME, TaggedIssue
+from .utility import replace_extension
+
+EXPECTED_COLUMNS: set[str] = {'title', 'page', 'text'}
+DERIVED_COLUMNS: set[str] = {'document_name', 'issue_name', 'document_id', 'year'}
+
 
 def read_header(filename: str) -> str:
     with open(filename, "r", encoding='utf-8') as fp:
         return fp.readline()
 
 
-def load_bolima(filename: str) -> pd.DataFrame:
+def read_separator(filename: str) -> str:
+    header = read_header(filename)
+    return '\t' if header.count('\t') > 0 else ','
+
+
+def is_columnar(filename: str) -> bool:
+    return filename.endswith(("feather", "arrow", "parquet"))
+
+
+def load_bolima(
+    filename: str,
+    years: tuple[int, int] = None,
+    titles: list[str] = None,
+    cache_folder: str = None,
+    memory_map: bool = False,
+) -> pd.DataFrame:
+    """Load corpus from CSV, TSV, feather or parquet file.
+
+    Args:
+        filename (str): Source file.
+        years (tuple[int, int], optional): Only load issues published within (first, last) years. Defaults to None.
+        titles (list[str], optional): Only load issues with given titles. Defaults to None.
+        cache_folder (str, optional): If set, CSV sources are loaded via a feather cache (see `cache_source`).
+        memory_map (bool, optional): If true, feather/Arrow IPC sources are memory-mapped. Defaults to False.
+
+    When memory-mapped, the `text` column is kept as a `string[pyarrow]` column backed by the
+    mapped file (zero-copy if the file is uncompressed), so processes that read the same file
+    share the page cache. Texts become Python strings only when an issue's pages are accessed.
+
+    For feather and parquet sources the filters are pushed down into the Arrow dataset scan,
+    and only the title, page, text and (if present) derived columns are read. Note that if
+    the source has no `document_id` column, ids are then assigned relative to the selection.
+    """
 
     corpus: pd.DataFrame
 
-    if filename.endswith("feather"):
-        corpus = pd.read_feather(filename)
+    if cache_folder and not is_columnar(filename):
+        filename = cache_source(filename, cache_folder)
 
-    elif filename.endswith("parquet"):
-        corpus: pd.DataFrame = pd.read_parquet(filename)
+    if is_columnar(filename):
+        dataset: ds.Dataset = _open_dataset(filename, memory_map=memory_map)
+        corpus = arrow_to_pandas(dataset.to_table(**_scan_args(dataset, years, titles)), keep_text=memory_map)
 
     else:
-        header = read_header(filename)
-        sep = '\t' if header.count('\t') > 0 else ','
-        corpus = pd.read_csv(filename, sep=sep)
+        corpus = pd.read_csv(filename, sep=read_separator(filename))
+
+    return filter_corpus(prepare_corpus(corpus), years=years, titles=titles)
+
 
-    expected_columns: set[str] = {'title', 'page', 'text'}
+def prepare_corpus(corpus: pd.DataFrame) -> pd.DataFrame:
+    """Validate `corpus` and add derived columns if missing."""
 
-    if set(corpus.columns).intersection(expected_columns) != expected_columns:
-        raise ValueError(f"column(s) not found: {expected_columns-set(corpus.columns)}")
+    if set(corpus.columns).intersection(EXPECTED_COLUMNS) != EXPECTED_COLUMNS:
+        raise ValueError(f"column(s) not found: {EXPECTED_COLUMNS-set(corpus.columns)}")
 
     if 'document_name' not in corpus.columns:
 
@@ -41,10 +94,389 @@ def load_bolima(filename: str) -> pd.DataFrame:
     return corpus
 
 
-def issue_reader(source: str | pd.DataFrame) -> Iterable[tuple[str, pd.DataFrame]]:
-    corpus: pd.DataFrame = source if isinstance(source, pd.DataFrame) else load_bolima(filename=source)
-    titles: list[str] = sorted(corpus['title'].unique())
-    for title in tqdm(titles):
-        pages: pd.DataFrame = corpus[corpus['title'] == title].copy()
-        pages.drop(columns=['Unnamed: 0'], errors='ignore', inplace=True)
-        yield (title, pages)
+def cache_source(filename: str, cache_folder: str) -> str:
+    """Return filename of a validated and enriched feather copy of CSV source `filename`.
+
+    The cached file is keyed by the source's absolute path, size and modification time,
+    and is created on first use with Arrow's multithreaded CSV parser. Stale copies of
+    the same source are removed when a new copy is created. The copy is stored uncompressed
+    so that it can be memory-mapped.
+    """
+    stat: os.stat_result = os.stat(filename)
+    path_key: str = hashlib.sha1(os.path.abspath(filename).encode('utf-8')).hexdigest()[:8]
+    stat_key: str = hashlib.sha1(f"{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8')).hexdigest()[:8]
+    basename: str = os.path.splitext(os.path.basename(filename))[0]
+    cache_filename: str = os.path.join(cache_folder, f"{basename}_{path_key}_{stat_key}.feather")
+
+    if os.path.isfile(cache_filename):
+        return cache_filename
+
+    os.makedirs(cache_folder, exist_ok=True)
+
+    corpus: pd.DataFrame = prepare_corpus(read_csv_arrow(filename))
+
+    for stale_filename in glob.glob(os.path.join(cache_folder, f"{basename}_{path_key}_*.feather")):
+        os.remove(stale_filename)
+
+    corpus.to_feather(f"{cache_filename}.tmp", compression='uncompressed')
+    os.replace(f"{cache_filename}.tmp", cache_filename)
+
+    return cache_filename
+
+
+def read_csv_arrow(filename: str) -> pd.DataFrame:
+    """Read CSV/TSV file using Arrow's multithreaded parser. Unnamed columns are named, and missing
+    values (e.g. empty fields and `NA`) are read as NaN, as pandas does."""
+    table: pa.Table = pa_csv.read_csv(
+        filename,
+        read_options=pa_csv.ReadOptions(use_threads=True),
+        parse_options=pa_csv.ParseOptions(delimiter=read_separator(filename), newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(strings_can_be_null=True, null_values=sorted(STR_NA_VALUES)),
+    )
+    corpus: pd.DataFrame = table.to_pandas()
+    corpus.columns = [name or f"Unnamed: {i}" for i, name in enumerate(corpus.columns)]
+    return corpus
+
+
+def filter_corpus(corpus: pd.DataFrame, years: tuple[int, int] = None, titles: list[str] = None) -> pd.DataFrame:
+    """Return pages within `years` (inclusive range) having one of `titles`."""
+
+    if years is None and titles is None:
+        return corpus
+
+    mask: np.ndarray = np.ones(len(corpus), dtype=bool)
+
+    if years is not None:
+        mask &= corpus['year'].between(years[0], years[1]).to_numpy()
+
+    if titles is not None:
+        mask &= corpus['title'].isin(titles).to_numpy()
+
+    return corpus if mask.all() else corpus[mask]
+
+
+def _open_dataset(filename: str, memory_map: bool = False) -> ds.Dataset:
+    if filename.endswith("parquet"):
+        return ds.dataset(filename, format='parquet')
+    return ds.dataset(filename, format='feather', filesystem=pa_fs.LocalFileSystem(use_mmap=memory_map))
+
+
+def arrow_to_pandas(data: pa.Table | pa.RecordBatch, keep_text: bool = False) -> pd.DataFrame:
+    """Convert `data` to pandas. If `keep_text` then `text` is kept as an Arrow backed string column."""
+
+    if not keep_text or 'text' not in data.schema.names:
+        return data.to_pandas()
+
+    if isinstance(data, pa.RecordBatch):
+        data = pa.Table.from_batches([data])
+
+    text: pa.ChunkedArray = data.column('text')
+    if text.type != pa.string():
+        text = text.cast(pa.string())
+
+    frame: pd.DataFrame = data.drop(['text']).to_pandas()
+    frame.insert(data.schema.names.index('text'), 'text', pd.arrays.ArrowStringArray(text))
+    return frame
+
+
+def _scan_args(dataset: ds.Dataset, years: tuple[int, int] = None, titles: list[str] = None) -> dict:
+    """Return projection and filter expression for a scan of `dataset`."""
+    schema_names: list[str] = dataset.schema.names
+    columns: list[str] = [name for name in schema_names if name in EXPECTED_COLUMNS | DERIVED_COLUMNS]
+    expression: ds.Expression = None
+
+    if years is not None:
+        year: ds.Expression = (
+            ds.field('year')
+            if 'year' in schema_names
+            else pc.replace_substring_regex(ds.field('title'), pattern=r'^[^-]*-(\d{4}).*$', replacement=r'\1').cast(
+                pa.int32()
+            )
+        )
+        expression = (year >= years[0]) & (year <= years[1])
+
+    if titles is not None:
+        title_expression: ds.Expression = ds.field('title').isin(list(titles))
+        expression = title_expression if expression is None else expression & title_expression
+
+    return dict(columns=columns, filter=expression)
+
+
+def load_bolima_chunks(
+    filename: str,
+    chunksize: int = 10000,
+    years: tuple[int, int] = None,
+    titles: list[str] = None,
+    cache_folder: str = None,
+    memory_map: bool = False,
+) -> Iterable[pd.DataFrame]:
+    """Read source in bounded chunks. Yield validated and enriched frames.
+
+    CSV files are read `chunksize` rows at a time, parquet and feather files are scanned
+    in batches of at most `chunksize` rows with filters pushed down (see `load_bolima`).
+    All chunks are indexed by row number in the (selected) source, so derived `document_id`s
+    equal those of `load_bolima`.
+    """
+
+    chunks: Iterable[pd.DataFrame]
+
+    if cache_folder and not is_columnar(filename):
+        filename = cache_source(filename, cache_folder)
+
+    if is_columnar(filename):
+        dataset: ds.Dataset = _open_dataset(filename, memory_map=memory_map)
+        batches = dataset.to_batches(batch_size=chunksize, **_scan_args(dataset, years, titles))
+        chunks = (arrow_to_pandas(batch, keep_text=memory_map) for batch in batches)
+
+    else:
+        chunks = pd.read_csv(filename, sep=read_separator(filename), chunksize=chunksize)
+
+    offset: int = 0
+    for chunk in chunks:
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+        offset += len(chunk)
+        yield filter_corpus(prepare_corpus(chunk), years=years, titles=titles)
+
+
+def partition_issues(corpus: pd.DataFrame) -> Iterable[tuple[str, pd.DataFrame]]:
+    """Split `corpus` into issues in a single pass. Yield (title, pages) in title order.
+
+    The corpus is partitioned using one stable argsort of the titles, so pages keep
+    their corpus order within each issue. If the corpus is already sorted by title the
+    pages are yielded as positional slices, otherwise each issue is gathered separately.
+    """
+    corpus = corpus.drop(columns=['Unnamed: 0'], errors='ignore')
+
+    if len(corpus) == 0:
+        return
+
+    titles: np.ndarray = corpus['title'].to_numpy(dtype=object)
+    order: np.ndarray = np.argsort(titles, kind='stable')
+    is_sorted: bool = bool((order == np.arange(len(order))).all())
+
+    sorted_titles: np.ndarray = titles[order]
+    bounds: np.ndarray = np.concatenate(
+        [[0], np.flatnonzero(sorted_titles[1:] != sorted_titles[:-1]) + 1, [len(sorted_titles)]]
+    )
+
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        pages: pd.DataFrame = corpus.iloc[start:end] if is_sorted else corpus.take(order[start:end])
+        yield (sorted_titles[start], pages)
+
+
+def stream_issues(chunks: Iterable[pd.DataFrame]) -> Iterable[tuple[str, pd.DataFrame]]:
+    """Split a stream of corpus chunks into issues. Yield (title, pages) in source order.
+
+    Pages of an issue must be stored contiguously in the source. The trailing issue of
+    each chunk is carried over to the next chunk, so at most one issue plus one chunk
+    is held in memory.
+    """
+    carry: pd.DataFrame = None
+    seen: set[str] = set()
+
+    def emit(pages: pd.DataFrame) -> tuple[str, pd.DataFrame]:
+        title: str = pages['title'].iat[0]
+        if title in seen:
+            raise ValueError(f"source is not grouped by title: {title} is not contiguous")
+        seen.add(title)
+        return (title, pages)
+
+    for chunk in chunks:
+
+        chunk = chunk.drop(columns=['Unnamed: 0'], errors='ignore')
+
+        if len(chunk) == 0:
+            continue
+
+        titles: np.ndarray = chunk['title'].to_numpy(dtype=object)
+        bounds: np.ndarray = np.concatenate([[0], np.flatnonzero(titles[1:] != titles[:-1]) + 1, [len(titles)]])
+
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            pages: pd.DataFrame = chunk.iloc[start:end]
+            if carry is not None:
+                if carry['title'].iat[0] == titles[start]:
+                    pages = pd.concat([carry, pages])
+                else:
+                    yield emit(carry)
+            carry = pages
+
+    if carry is not None:
+        yield emit(carry)
+
+
+def issue_reader(
+    source: str | pd.DataFrame,
+    chunksize: int = None,
+    years: tuple[int, int] = None,
+    titles: list[str] = None,
+    cache_folder: str = None,
+    memory_map: bool = False,
+) -> Iterable[tuple[str, pd.DataFrame]]:
+    """Yield (title, pages) for each issue in `source`, optionally filtered by `years` and `titles`.
+
+    If `chunksize` is given and `source` is a filename, the source is streamed in chunks
+    and issues are yielded in source order (see `stream_issues`).
+    """
+    if chunksize and not isinstance(source, pd.DataFrame):
+        chunks = load_bolima_chunks(
+            source, chunksize=chunksize, years=years, titles=titles, cache_folder=cache_folder, memory_map=memory_map
+        )
+        yield from tqdm(stream_issues(chunks))
+        return
+
+    corpus: pd.DataFrame = (
+        filter_corpus(source, years=years, titles=titles)
+        if isinstance(source, pd.DataFrame)
+        else load_bolima(filename=source, years=years, titles=titles, cache_folder=cache_folder, memory_map=memory_map)
+    )
+    yield from tqdm(partition_issues(corpus), total=corpus['title'].nunique())
+
+
+def raw_store_titles(folder: str) -> list[str]:
+    """Return titles in raw tagged store `folder` in store order."""
+    with open(os.path.join(folder, RAW_TITLES_FILENAME), 'r', encoding='utf-8') as fp:
+        return fp.read().splitlines()
+
+
+def read_raw_issue(folder: str, title: str, years: tuple[int, int] = None) -> TaggedIssue | None:
+    """Read tagged issue `title` from raw tagged store `folder` (see `dispatch.RawTaggedFrameDispatcher`).
+
+    Returns None (without reading the tagged frame) if the issue isn't published within `years`.
+    """
+    item: TaggedIssue = TaggedIssue(title=title, document_index=None, tagged_frame=None)
+    item.document_index = pd.read_feather(os.path.join(folder, replace_extension(item.index_name, 'feather')))
+
+    if years is not None and not item.document_index['year'].between(years[0], years[1]).any():
+        return None
+
+    item.tagged_frame = pd.read_feather(os.path.join(folder, replace_extension(item.filename, 'feather')))
+    item.tagged_frame.index = item.tagged_frame.groupby('document_id').cumcount().to_numpy()
+    return item
+
+
+def raw_issue_reader(
+    folder: str, years: tuple[int, int] = None, titles: list[str] = None, exclude: set[str] = None
+) -> Iterable[TaggedIssue]:
+    """Yield tagged issues in raw tagged store `folder` in store order, optionally filtered by `years` and `titles`.
+
+    Issues in `exclude` are skipped without being read.
+    """
+    selected: list[str] = [
+        title
+        for title in raw_store_titles(folder)
+        if (titles is None or title in titles) and (exclude is None or title not in exclude)
+    ]
+    for title in tqdm(selected):
+        item: TaggedIssue | None = read_raw_issue(folder, title, years=years)
+        if item is not None:
+            yield item
+
+
+def widen_tagged_frame(tagged_frame: pd.DataFrame) -> pd.DataFrame:
+    """Return `tagged_frame` with dictionary encoded strings as plain strings, and integers as int64."""
+    for column in tagged_frame.columns:
+        dtype = tagged_frame[column].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            tagged_frame[column] = tagged_frame[column].astype(object)
+        elif pd.api.types.is_integer_dtype(dtype) and dtype != np.int64:
+            tagged_frame[column] = tagged_frame[column].astype(np.int64)
+    return tagged_frame
+
+
+def read_tagged_frame(filename: str, widen: bool = True) -> pd.DataFrame:
+    """Read a dispatched tagged frame (feather or, possibly gzip, bz2, lzma, zstd or lz4 compressed, CSV).
+
+    Dispatched frames are stored with narrow types (int32/int8 ids, dictionary encoded strings).
+    If `widen` is true, these are returned as int64 and plain strings.
+    """
+    codecs: dict[str, str] = {'.zst': 'zstd', '.lz4': 'lz4'}
+    extension: str = os.path.splitext(filename)[1]
+
+    if extension == '.feather':
+        tagged_frame: pd.DataFrame = pd.read_feather(filename)
+    elif extension in codecs:
+        with pa.input_stream(filename, compression=codecs[extension]) as fp:
+            tagged_frame = pd.read_csv(io.BytesIO(fp.read()), sep='\t', index_col=0, na_filter=False)
+    else:
+        tagged_frame = pd.read_csv(filename, sep='\t', index_col=0, na_filter=False)
+    return widen_tagged_frame(tagged_frame) if widen else tagged_frame
+
+
+def read_tagged_dataset(
+    folder: str,
+    columns: list[str] = None,
+    years: tuple[int, int] = None,
+    document_ids: tuple[int, int] = None,
+    widen: bool = True,
+) -> pd.DataFrame:
+    """Read tagged frames from partitioned dataset in `folder` (see `dispatch.PartitionedDatasetMixIn`).
+
+    Only `columns` are read. Partitions outside `years` are skipped, and so are row groups (issues) having
+    no document id within `document_ids` (inclusive range). The `year` partition key is read as a column
+    unless `columns` excludes it.
+    """
+    dataset: ds.Dataset = ds.dataset(os.path.join(folder, DATASET_FOLDER), format='parquet', partitioning='hive')
+
+    expression: ds.Expression = None
+    if years is not None:
+        expression = (ds.field('year') >= years[0]) & (ds.field('year') <= years[1])
+    if document_ids is not None:
+        in_range: ds.Expression = (ds.field('document_id') >= document_ids[0]) & (
+            ds.field('document_id') <= document_ids[1]
+        )
+        expression = in_range if expression is None else expression & in_range
+
+    tagged_frame: pd.DataFrame = dataset.to_table(columns=columns, filter=expression).to_pandas()
+    return widen_tagged_frame(tagged_frame) if widen else tagged_frame
+
+
+class TaggedArchive:
+    """Reader of tagged corpus Zip archive (see `dispatch.ZipArchiveMixIn`). Members are read when accessed.
+
+    Args:
+        filename (str): Archive filename, or target folder containing the archive.
+    """
+
+    INDEX_MEMBERS: set[str] = {'document_index.csv', 'token2id.csv', 'term_frequencies.csv'}
+
+    def __init__(self, filename: str):
+        if os.path.isdir(filename):
+            filename = os.path.join(filename, ARCHIVE_FILENAME)
+        self.archive: zipfile.ZipFile = zipfile.ZipFile(filename, mode='r')
+
+    def __enter__(self) -> "TaggedArchive":
+        return self
+
+    def __exit__(self, _type, _value, _traceback):
+        self.close()
+        return False
+
+    def close(self) -> None:
+        self.archive.close()
+
+    @property
+    def members(self) -> list[str]:
+        """Names of tagged frame members, in archive order."""
+        return [name for name in self.archive.namelist() if name not in self.INDEX_MEMBERS]
+
+    @property
+    def document_index(self) -> pd.DataFrame:
+        return self.read_member('document_index.csv')
+
+    @property
+    def token2id(self) -> pd.DataFrame:
+        return self.read_member('token2id.csv')
+
+    @property
+    def term_frequencies(self) -> pd.DataFrame:
+        return self.read_member('term_frequencies.csv')
+
+    def read_member(self, member: str) -> pd.DataFrame:
+        with self.archive.open(member) as fp:
+            return pd.read_csv(fp, sep='\t', index_col=0, na_filter=False)
+
+    def tagged_frame(self, title: str) -> pd.DataFrame:
+        """Read tagged frame of issue `title`."""
+        return widen_tagged_frame(
+            self.read_member(TaggedIssue(title=title, document_index=None, tagged_frame=None).filename)
+        )
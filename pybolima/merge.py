@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import os
+from fnmatch import fnmatch
+from glob import glob
+
+import numpy as np
+import pandas as pd
+
+from .dispatch import (
+    DOCUMENT_INDEX_STREAM,
+    DispatchOptions,
+    IdTaggedFramePerGroupDispatcher,
+    TaggedFramePerGroupDispatcher,
+    factorize,
+    to_int32,
+)
+from .interface import TaggedIssue
+from .load import read_tagged_frame
+
+jj = os.path.join
+
+
+def find_stored(folder: str, name: str) -> str | None:
+    """Return name of file stored as `name` (with any extension) in `folder`, or None if there's no such file."""
+    filenames: list[str] = [
+        x for x in glob(jj(folder, f"{name}.*")) if not fnmatch(os.path.basename(x), DOCUMENT_INDEX_STREAM.format('*'))
+    ]
+    if len(filenames) > 1:
+        raise ValueError(f"{name} is stored in more than one format in {folder}")
+    return filenames[0] if filenames else None
+
+
+def read_stored(folder: str, name: str, widen: bool = True) -> pd.DataFrame:
+    """Read frame stored as `name` (any format written by `TaggedFramePerGroupDispatcher.store`) in `folder`."""
+    filename: str = find_stored(folder, name)
+    if filename is None:
+        raise FileNotFoundError(f"{name} not found in {folder}")
+    return read_tagged_frame(filename, widen=widen)
+
+
+def merge_vocabularies(vocabularies: list[pd.DataFrame]) -> tuple[np.ndarray, list[np.ndarray]]:
+    """Merge shard vocabularies (`token`, `token_id` frames) into one vocabulary.
+
+    Tokens get global ids in order of first appearance over shards in given order, which (if shards
+    are consecutive parts of the corpus) are the ids a sequential run would give them.
+
+    Returns:
+        tuple[np.ndarray, list[np.ndarray]]: Global vocabulary (tokens in id order), and for each shard,
+        an array mapping local token ids to global ids.
+    """
+    codes, tokens = factorize(pd.Series(np.concatenate([v.token.to_numpy(dtype=object) for v in vocabularies])))
+    codes = to_int32(codes)
+
+    remaps: list[np.ndarray] = []
+    start: int = 0
+    for vocabulary in vocabularies:
+        remap: np.ndarray = np.zeros(len(vocabulary), dtype=codes.dtype)
+        remap[vocabulary.token_id.to_numpy()] = codes[start : start + len(vocabulary)]
+        remaps.append(remap)
+        start += len(vocabulary)
+
+    return tokens, remaps
+
+
+def remap_tagged_frame(tagged_frame: pd.DataFrame, remap: np.ndarray, document_id: int) -> pd.DataFrame:
+    """Map `token_id`/`lemma_id` to global ids using `remap`, and shift document ids by `document_id`."""
+    for column in ['token_id', 'lemma_id']:
+        if column in tagged_frame.columns and remap is not None:
+            tagged_frame[column] = remap[tagged_frame[column].to_numpy()]
+    tagged_frame['document_id'] = to_int32(tagged_frame['document_id'].to_numpy() + document_id)
+    return tagged_frame
+
+
+def merge_frequencies(
+    dispatcher: IdTaggedFramePerGroupDispatcher, frequencies: pd.DataFrame, remap: np.ndarray
+) -> None:
+    """Add shard's term and document frequencies (local ids mapped to global ids by `remap`) to `dispatcher`'s."""
+    ids: np.ndarray = remap[frequencies.token_id.to_numpy()]
+    for name in ['token', 'lemma']:
+        if f'{name}_tf' in frequencies.columns:
+            dispatcher.add_frequencies(
+                name, ids, frequencies[f'{name}_tf'].to_numpy(), frequencies[f'{name}_df'].to_numpy()
+            )
+
+
+def merge_shards(sources: list[str], target: str, opts: DispatchOptions) -> None:
+    """Merge outputs of shards `sources` (folders with one file per issue) into `target`.
+
+    Shards are outputs of separate runs (e.g. processes or nodes) over consecutive parts of the corpus,
+    each having its own document ids and (if codified) vocabulary. The merged output is stored in `target`
+    using storage options in `opts`, and equals the output of a sequential run over the shards in given order:
+    document ids are shifted by the number of documents in previous shards, and token and lemma ids are
+    mapped to ids in the merged vocabulary. Term and document frequencies of shards are summed.
+
+    Only folder outputs (one file per issue) are supported, both as shards and as merged output.
+
+    Raises:
+        ValueError: If `opts.compress_type` is a single-file output type ('parquet' or 'zip').
+    """
+    if opts.compress_type in ('parquet', 'zip'):
+        raise ValueError(f"merge of shards into {opts.compress_type} output is not supported (use a folder output)")
+
+    vocabularies: list[pd.DataFrame] = None
+    if all(find_stored(source, 'token2id') for source in sources):
+        vocabularies = [read_stored(source, 'token2id') for source in sources]
+
+    dispatch_cls: type = TaggedFramePerGroupDispatcher if vocabularies is None else IdTaggedFramePerGroupDispatcher
+
+    with dispatch_cls(target=target, opts=opts) as dispatcher:
+        remaps: list[np.ndarray] = [None] * len(sources)
+        if vocabularies is not None:
+            tokens, remaps = merge_vocabularies(vocabularies)
+            dispatcher.vocabulary.encode(tokens)
+
+        for source, remap in zip(sources, remaps):
+            document_index: pd.DataFrame = read_stored(source, 'document_index')
+            for title in document_index.title.unique():
+                issue: TaggedIssue = TaggedIssue(title=title, document_index=None, tagged_frame=None)
+                tagged_frame: pd.DataFrame = read_stored(source, issue.safe_title, widen=False)
+                remap_tagged_frame(tagged_frame, remap, dispatcher.document_id)
+                dispatcher.write_issue(issue, [(jj(target, issue.filename), tagged_frame)])
+
+            if remap is not None and find_stored(source, 'term_frequencies'):
+                merge_frequencies(dispatcher, read_stored(source, 'term_frequencies'), remap)
+
+            document_index['document_id'] += dispatcher.document_id
+            dispatcher.write_index_item(document_index)
+            dispatcher.document_id += len(document_index)
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+import typing as t
+from dataclasses import dataclass
+
+T = t.TypeVar('T')
+
+_END = object()
+
+
+@dataclass
+class _Failure:
+    error: BaseException
+
+
+def prefetch(iterable: t.Iterable[T], maxsize: int) -> t.Iterator[T]:
+    """Iterate `iterable` in a background thread, at most `maxsize` items ahead of the consumer.
+
+    Items are yielded in order. An exception raised by `iterable` is re-raised in the consumer.
+    If the consumer stops early, the background thread is stopped at its next item.
+    """
+    items: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+    stopped: threading.Event = threading.Event()
+
+    def put(item: t.Any) -> bool:
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as ex:  # pylint: disable=broad-except
+            put(_Failure(ex))
+            return
+        put(_END)
+
+    thread: threading.Thread = threading.Thread(target=produce, name="prefetch", daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = items.get()
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stopped.set()
+        thread.join()
+
+
+@dataclass
+class TaskQueueStats:
+    n_tasks: int = 0
+    max_depth: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        return self.elapsed / self.n_tasks if self.n_tasks else 0.0
+
+    def __str__(self) -> str:
+        return f"tasks={self.n_tasks} max_depth={self.max_depth} mean_latency={self.mean_latency:.4f}s"
+
+
+class TaskQueue:
+    """Runs submitted tasks in background thread(s) fed by a bounded queue.
+
+    `submit` blocks while the queue is full (backpressure). With one thread, tasks are run in
+    submit order. The first error raised by a task is re-raised at the next `submit`, `join` or
+    `close`, after which no more tasks are accepted.
+    """
+
+    def __init__(self, maxsize: int = 8, workers: int = 1, name: str = "task-queue"):
+        self.tasks: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+        self.errors: list[BaseException] = []
+        self.stats: TaskQueueStats = TaskQueueStats()
+        self.lock: threading.Lock = threading.Lock()
+        self.threads: list[threading.Thread] = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True) for i in range(max(1, workers))
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def __enter__(self) -> "TaskQueue":
+        return self
+
+    def __exit__(self, _type, _value, _traceback):
+        if _type is None:
+            self.close()
+        else:
+            self.close(raise_error=False)
+        return False
+
+    @property
+    def depth(self) -> int:
+        return self.tasks.qsize()
+
+    def submit(self, fx: t.Callable, *args, **kwargs) -> None:
+        self.raise_error()
+        self.tasks.put((fx, args, kwargs))
+        with self.lock:
+            self.stats.max_depth = max(self.stats.max_depth, self.tasks.qsize())
+
+    def join(self) -> None:
+        """Wait until all submitted tasks are done."""
+        self.tasks.join()
+        self.raise_error()
+
+    def close(self, raise_error: bool = True) -> None:
+        """Wait for submitted tasks, then stop the threads."""
+        for _ in self.threads:
+            self.tasks.put(None)
+        for thread in self.threads:
+            thread.join()
+        if raise_error:
+            self.raise_error()
+
+    def raise_error(self) -> None:
+        with self.lock:
+            if self.errors:
+                raise self.errors[0]
+
+    def _run(self) -> None:
+        while True:
+            task = self.tasks.get()
+            try:
+                if task is None:
+                    return
+                fx, args, kwargs = task
+                if self.errors:
+                    continue
+                start: float = time.perf_counter()
+                fx(*args, **kwargs)
+                with self.lock:
+                    self.stats.n_tasks += 1
+                    self.stats.elapsed += time.perf_counter() - start
+            except BaseException as ex:  # pylint: disable=broad-except
+                with self.lock:
+                    self.errors.append(ex)
+            finally:
+                self.tasks.task_done()
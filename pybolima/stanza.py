@@ -4,11 +4,15 @@ NOTE! THIS CODE IS IN PART BASED ON https://github.com/spraakbanken/sparv-pipeli
 import abc
 import itertools
 import os
+import time
+from dataclasses import dataclass
 from functools import reduce
 from typing import Any, Callable, Union
 
 import stanza
 
+from .utility import segment
+
 jj = os.path.join
 
 TaggedData = dict[str, list[str]]
@@ -26,12 +30,85 @@ STANZA_CONFIGS: dict = {
 }
 
 
+@dataclass
+class TaggerStats:
+    """Batching statistics. Padded tokens are counted as batch size times longest document in batch."""
+
+    n_documents: int = 0
+    n_batches: int = 0
+    n_tokens: int = 0
+    n_padded_tokens: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def padding_ratio(self) -> float:
+        """Share of padded tokens that is padding."""
+        return 1.0 - self.n_tokens / self.n_padded_tokens if self.n_padded_tokens else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.n_tokens / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"documents={self.n_documents} batches={self.n_batches} tokens={self.n_tokens} "
+            f"padding_ratio={self.padding_ratio:.3f} tokens/s={self.tokens_per_second:.1f}"
+        )
+
+
+def stanza_config(
+    model: str,
+    lang: str = "sv",
+    processors: str = "lemma,pos",
+    tokenize_pretokenized: bool = True,
+    tokenize_no_ssplit: bool = True,
+) -> dict[str, Any]:
+    """Returns settings that determine the output of a Stanza tagger (e.g. to identify cached results)."""
+    config: dict = STANZA_CONFIGS[lang]
+    models: dict[str, str] = {
+        key: os.path.basename(model_path)
+        for key, model_path in config.items()
+        if key in ("lem_model", "pos_model", "pretrain_pos_model")
+    }
+    return dict(
+        tagger="stanza",
+        version=stanza.__version__,
+        model=os.path.abspath(model),
+        lang=lang,
+        processors=processors,
+        tokenize_pretokenized=tokenize_pretokenized,
+        tokenize_no_ssplit=tokenize_no_ssplit,
+        **models,
+    )
+
+
+def length_sorted_batches(lengths: list[int], token_budget: int) -> list[list[int]]:
+    """Group document indices into batches of similar length.
+
+    Documents are sorted by decreasing length, and each batch is filled while batch size times
+    its longest document is within `token_budget`. A document longer than the budget is a batch of its own.
+    """
+    batches: list[list[int]] = []
+    for i in sorted(range(len(lengths)), key=lambda i: -lengths[i]):
+        if batches and (len(batches[-1]) + 1) * lengths[batches[-1][0]] <= token_budget:
+            batches[-1].append(i)
+        else:
+            batches.append([i])
+    return batches
+
+
 class ITagger(abc.ABC):
-    def __init__(self, preprocessors: Callable[[str], str] = None):
+    def __init__(
+        self, preprocessors: Callable[[str], str] = None, token_budget: int = None, max_segment_length: int = None
+    ):
         self.preprocessors: Callable[[str], str] = preprocessors or []
+        self.token_budget: int = token_budget
+        self.max_segment_length: int = max_segment_length
+        self.stats: TaggerStats = TaggerStats()
+        self.config: dict[str, Any] = dict(tagger=type(self).__name__)
 
-    def tag(self, text: Union[str, list[str]]) -> list[TaggedData]:
-        """Tag text. Return dict if lists."""
+    def tag(self, text: Union[str, list[str]], preprocessed: bool = False) -> list[TaggedData]:
+        """Tag text. Return dict if lists. If `preprocessed` then `text` already is preprocessed."""
         if isinstance(text, str):
             text = [text]
 
@@ -41,11 +118,31 @@ class ITagger(abc.ABC):
         if len(text) == 0:
             return []
 
-        if self.preprocessors:
+        if not preprocessed and (self.preprocessors or self.max_segment_length):
             text: list[str] = [self.preprocess(d) for d in text]
 
-        tagged_documents = self._tag(text)
+        lengths: list[int] = [len(d.split()) for d in text]
+
+        if not self.token_budget:
+            return self._tag_batch(text, lengths)
+
+        tagged_documents: list[TaggedData] = [None] * len(text)
+        for batch in length_sorted_batches(lengths, self.token_budget):
+            tagged_batch: list[TaggedData] = self._tag_batch([text[i] for i in batch], [lengths[i] for i in batch])
+            for i, tagged_document in zip(batch, tagged_batch):
+                tagged_documents[i] = tagged_document
+
+        return tagged_documents
 
+    def _tag_batch(self, text: list[str], lengths: list[int]) -> list[TaggedData]:
+        """Tag `text` as one batch and update statistics."""
+        start: float = time.perf_counter()
+        tagged_documents: list[TaggedData] = self._tag(text)
+        self.stats.elapsed += time.perf_counter() - start
+        self.stats.n_documents += len(text)
+        self.stats.n_batches += 1
+        self.stats.n_tokens += sum(lengths)
+        self.stats.n_padded_tokens += len(lengths) * max(lengths)
         return tagged_documents
 
     @abc.abstractmethod
@@ -75,8 +172,14 @@ class ITagger(abc.ABC):
         return csv_str
 
     def preprocess(self, text: str) -> str:
-        """Transform `text` with preprocessors."""
+        """Transform `text` with preprocessors, then split it into segments if `max_segment_length` is set.
+
+        Segments are separated by newlines, which a pretokenized Stanza pipeline tags as separate
+        sentences within the same document. Tokens and token counts per document are unchanged.
+        """
         text: str = reduce(lambda res, f: f(res), self.preprocessors, text)
+        if self.max_segment_length:
+            text = segment(text, self.max_segment_length)
         return text
 
 
@@ -92,8 +195,12 @@ class StanzaTagger(ITagger):
         tokenize_pretokenized: bool = True,
         tokenize_no_ssplit: bool = True,
         use_gpu: bool = True,
+        token_budget: int = None,
+        max_segment_length: int = None,
     ):
-        super().__init__(preprocessors=preprocessors)  ## or [pretokenize])
+        super().__init__(
+            preprocessors=preprocessors, token_budget=token_budget, max_segment_length=max_segment_length
+        )  ## or [pretokenize])
 
         """Initialize stanza pipeline
 
@@ -105,8 +212,19 @@ class StanzaTagger(ITagger):
             tokenize_pretokenized (bool, optional): If true, then already tokenized. Defaults to True.
             tokenize_no_ssplit (bool, optional): [description]. Defaults to True.
             use_gpu (bool, optional): If true, use GPU if exists. Defaults to True.
+            token_budget (int, optional): If set, documents are sorted by length and passed to Stanza
+                in batches of at most this many (padded) tokens. Defaults to None.
+            max_segment_length (int, optional): If set, pages are tagged as segments (sentences) of at most
+                this many tokens (requires `tokenize_pretokenized`). Defaults to None.
         """
         print(f"stanza: processors={processors} use_gpu={use_gpu}")
+        self.config: dict[str, Any] = stanza_config(
+            model=model,
+            lang=lang,
+            processors=processors,
+            tokenize_pretokenized=tokenize_pretokenized,
+            tokenize_no_ssplit=tokenize_no_ssplit,
+        )
         config: dict = STANZA_CONFIGS[lang]
         self.nlp: stanza.Pipeline = stanza.Pipeline(
             lang=lang,
@@ -1,37 +1,143 @@
 from __future__ import annotations
 
+import itertools
+import multiprocessing
+import os
+import sys
 import typing as t
-from io import StringIO
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
 
+import numpy as np
 import pandas as pd
 from loguru import logger
 from tqdm import tqdm
 
-from pybolima.dispatch import TaggedFramePerGroupDispatcher
-from pybolima.load import issue_reader
+from pybolima.dispatch import DispatchOptions, TaggedFramePerGroupDispatcher
+from pybolima.load import issue_reader, raw_issue_reader
 
+from .cache import CachedTagger
 from .interface import TaggedIssue
-from .stanza import ITagger
+from .pipeline import TaskQueue, prefetch
+from .stanza import ITagger, TaggedData
 from .transform import normalize_characters
 
 
 def tag_issues(
-    tagger: ITagger,
+    tagger: ITagger | t.Callable[[], ITagger],
     source: str | pd.DataFrame,
     target: str,
     dispatch_cls: t.Type[TaggedFramePerGroupDispatcher],
-    dispatch_opts: t.Type[TaggedFramePerGroupDispatcher],
+    dispatch_opts: DispatchOptions,
+    chunksize: int = None,
+    years: tuple[int, int] = None,
+    titles: list[str] = None,
+    cache_folder: str = None,
+    memory_map: bool = False,
+    batch_tokens: int = None,
+    workers: int = 1,
+    queue_size: int = 0,
 ):
+    """Tag issues in `source` and dispatch them to `target` in issue order.
+
+    If `workers` > 1, issues are tagged in a pool of worker processes, each creating its own tagger
+    once by calling `tagger` (which then must be a picklable tagger factory, not a tagger). The
+    dispatcher stays in this process, so document and vocabulary ids equal those of a sequential run.
+
+    If `queue_size` > 0, loading, tagging and dispatching run as overlapping stages connected by
+    queues of at most `queue_size` issues: a background thread reads, normalizes and preprocesses
+    issues, the calling thread tags them, and a background writer thread dispatches them in order.
+
+    Issues that the dispatcher has marked as completed (i.e. when resuming a checkpointed run) are skipped.
+    """
+    if workers > 1 and isinstance(tagger, ITagger):
+        raise TypeError("tagging in worker processes (workers > 1) requires a picklable tagger factory, not a tagger")
+
+    if workers <= 1 and not isinstance(tagger, ITagger):
+        tagger = tagger()
 
     with dispatch_cls(target=target, opts=dispatch_opts) as dispatcher:
-        for title, pages in issue_reader(source=source):
-            try:
-                tagged_issue: TaggedIssue = tag_issue(
-                    tagger=tagger, title=title, issue_pages=pages, normalize_chars=True
+        issues: t.Iterable[PendingIssue] = prepare_issues(
+            (
+                (title, issue_pages)
+                for title, issue_pages in issue_reader(
+                    source=source,
+                    chunksize=chunksize,
+                    years=years,
+                    titles=titles,
+                    cache_folder=cache_folder,
+                    memory_map=memory_map,
                 )
-                dispatcher.dispatch(tagged_issue=tagged_issue)
-            except Exception as ex:
-                logger.info(f"failed: {title} {ex}")
+                if title not in dispatcher.completed
+            ),
+            normalize_chars=True,
+            tagger=tagger if queue_size and isinstance(tagger, ITagger) else None,
+            keep_xpos=dispatcher.keep_xpos,
+        )
+
+        if queue_size:
+            issues = prefetch(issues, maxsize=queue_size)
+
+        tagged_issues: t.Iterable[tuple[str, TaggedIssue | Exception]] = (
+            tag_issue_batches(tagger=tagger, issues=issues, batch_tokens=batch_tokens)
+            if workers <= 1
+            else tag_issue_batches_parallel(
+                tagger_factory=tagger, issues=issues, workers=workers, batch_tokens=batch_tokens
+            )
+        )
+
+        if not queue_size:
+            for title, tagged_issue in tagged_issues:
+                dispatch_issue(dispatcher, title, tagged_issue)
+        else:
+            with TaskQueue(maxsize=queue_size, workers=1, name="dispatch") as writer:
+                for title, tagged_issue in tagged_issues:
+                    writer.submit(dispatch_issue, dispatcher, title, tagged_issue)
+            logger.info(f"dispatch: {writer.stats}")
+
+    if isinstance(tagger, ITagger):
+        logger.info(f"tagger: {tagger.stats}")
+
+    if isinstance(tagger, CachedTagger):
+        logger.info(f"cache: {tagger.cache_stats}")
+
+
+def dispatch_raw_issues(
+    source: str,
+    target: str,
+    dispatch_cls: t.Type[TaggedFramePerGroupDispatcher],
+    dispatch_opts: DispatchOptions,
+    years: tuple[int, int] = None,
+    titles: list[str] = None,
+    queue_size: int = 0,
+):
+    """Dispatch issues in raw tagged store `source` (see `RawTaggedFrameDispatcher`) to `target` in store order.
+
+    If `queue_size` > 0, issues are read by a background thread at most `queue_size` issues ahead.
+    """
+    with dispatch_cls(target=target, opts=dispatch_opts) as dispatcher:
+        issues: t.Iterable[TaggedIssue] = raw_issue_reader(
+            source, years=years, titles=titles, exclude=dispatcher.completed
+        )
+
+        if queue_size:
+            issues = prefetch(issues, maxsize=queue_size)
+
+        for tagged_issue in issues:
+            dispatch_issue(dispatcher, tagged_issue.title, tagged_issue)
+
+
+def dispatch_issue(
+    dispatcher: TaggedFramePerGroupDispatcher, title: str, tagged_issue: TaggedIssue | Exception
+) -> None:
+    """Dispatch `tagged_issue`. An issue that failed to be tagged is logged and skipped, while
+    dispatch (and storage) errors are raised, so that they stop the run."""
+    dispatcher.raise_write_error()
+    if isinstance(tagged_issue, Exception):
+        logger.info(f"failed: {title} {tagged_issue}")
+        return
+    dispatcher.dispatch(tagged_issue=tagged_issue)
 
 
 def tag_issue(
@@ -40,30 +146,228 @@ def tag_issue(
     title: str,
     issue_pages: pd.DataFrame,
     normalize_chars: None | str | bool = None,
+    keep_xpos: bool = False,
 ) -> TaggedIssue:
 
-    texts = issue_pages['text'].to_list()
-    document_index: pd.DataFrame = issue_pages.reset_index()
-    document_index.drop(columns="text", inplace=True)
+    texts: list[str] = issue_texts(issue_pages, normalize_chars=normalize_chars)
+    tagged_data: list[TaggedData] = tagger.tag(texts)
+
+    return create_tagged_issue(title=title, issue_pages=issue_pages, tagged_data=tagged_data, keep_xpos=keep_xpos)
+
+
+def issue_texts(issue_pages: pd.DataFrame, normalize_chars: None | str | bool = None) -> list[str]:
+    texts: list[str] = issue_pages['text'].to_list()
 
     if normalize_chars is not False:
         texts = [normalize_characters(text) for text in texts]
 
-    tagged_data: list[dict[str, list[str]]] = tagger.tag(texts)
-    tagged_pages: list[pd.DataFrame] = []
+    return texts
 
-    for i, tagged_page in enumerate(tagged_data):
 
-        tagged_csv_str: str = tagger.to_csv(tagged_page)
-        tagged_page: pd.DataFrame = pd.read_csv(StringIO(tagged_csv_str), sep='\t', quoting=3)
+def create_tagged_issue(
+    title: str, issue_pages: pd.DataFrame, tagged_data: list[TaggedData], keep_xpos: bool = False
+) -> TaggedIssue:
 
-        tagged_page['document_id'] = i
-        tagged_page.drop(columns="xpos", inplace=True)
-        tagged_pages.append(tagged_page)
+    document_index: pd.DataFrame = issue_pages.reset_index()
+    document_index.drop(columns="text", inplace=True)
 
-    tagged_issue_frame: pd.DataFrame = pd.concat(tagged_pages)
+    tagged_issue_frame: pd.DataFrame = to_tagged_frame(tagged_data, keep_xpos=keep_xpos)
 
     document_index["n_tokens"] = [d["n_tokens"] for d in tagged_data]
     document_index["n_words"] = [d["n_words"] for d in tagged_data]
 
     return TaggedIssue(title=title, document_index=document_index, tagged_frame=tagged_issue_frame)
+
+
+@dataclass
+class PendingIssue:
+    """Issue whose pages are (partially) tagged"""
+
+    title: str
+    pages: pd.DataFrame
+    texts: list[str]
+    tagged_data: list[TaggedData] = field(default_factory=list)
+    error: Exception = None
+    preprocessed: bool = False
+    keep_xpos: bool = False
+
+    @property
+    def is_done(self) -> bool:
+        return self.error is not None or len(self.tagged_data) == len(self.texts)
+
+    def result(self) -> TaggedIssue | Exception:
+        if self.error is not None:
+            return self.error
+        try:
+            return create_tagged_issue(
+                title=self.title, issue_pages=self.pages, tagged_data=self.tagged_data, keep_xpos=self.keep_xpos
+            )
+        except Exception as ex:  # pylint: disable=broad-except
+            return ex
+
+
+def prepare_issues(
+    issues: t.Iterable[tuple[str, pd.DataFrame] | PendingIssue],
+    normalize_chars: None | str | bool = None,
+    tagger: ITagger = None,
+    keep_xpos: bool = False,
+) -> t.Iterable[PendingIssue]:
+    """Extract (and normalize) texts of each issue. Preprocess texts with `tagger` if given.
+
+    A failing issue is yielded with its error set. Already prepared issues are passed through.
+    """
+    for issue in issues:
+
+        if isinstance(issue, PendingIssue):
+            yield issue
+            continue
+
+        title, pages = issue
+        try:
+            texts: list[str] = issue_texts(pages, normalize_chars)
+            if tagger is not None:
+                texts = [tagger.preprocess(text) for text in texts]
+            yield PendingIssue(
+                title=title, pages=pages, texts=texts, preprocessed=tagger is not None, keep_xpos=keep_xpos
+            )
+        except Exception as ex:  # pylint: disable=broad-except
+            yield PendingIssue(title=title, pages=pages, texts=[], error=ex)
+
+
+def tag_issue_batches(
+    *,
+    tagger: ITagger,
+    issues: t.Iterable[tuple[str, pd.DataFrame] | PendingIssue],
+    batch_tokens: int = None,
+    normalize_chars: None | str | bool = None,
+) -> t.Iterable[tuple[str, TaggedIssue | Exception]]:
+    """Tag pages of consecutive issues in batches. Yield (title, tagged issue) in issue order.
+
+    Pages are packed into batches of about `batch_tokens` whitespace separated tokens, so that
+    a batch can hold pages of several small issues, or a part of a large issue. Each batch is
+    tagged in one call to `tagger.tag`. If `batch_tokens` is None, each issue is one batch.
+
+    A failing issue is yielded as (title, exception). If a batch fails, its issues are tagged
+    one by one, so that only the failing issue(s) are lost.
+    """
+
+    pending: deque[PendingIssue] = deque()
+    batch: list[tuple[PendingIssue, str]] = []
+    n_batch_tokens: int = 0
+
+    for issue in prepare_issues(issues, normalize_chars):
+
+        pending.append(issue)
+
+        for text in issue.texts if issue.error is None else []:
+            batch.append((issue, text))
+            n_batch_tokens += len(text.split())
+            if batch_tokens and n_batch_tokens >= batch_tokens:
+                _tag_batch(tagger, batch)
+                batch, n_batch_tokens = [], 0
+
+        if not batch_tokens and batch:
+            _tag_batch(tagger, batch)
+            batch, n_batch_tokens = [], 0
+
+        while pending and pending[0].is_done:
+            issue = pending.popleft()
+            yield (issue.title, issue.result())
+
+    if batch:
+        _tag_batch(tagger, batch)
+
+    while pending:
+        issue = pending.popleft()
+        yield (issue.title, issue.result())
+
+
+def _tag_batch(tagger: ITagger, batch: list[tuple[PendingIssue, str]]) -> None:
+    """Tag texts in `batch`, and append result to each text's issue (in order)."""
+    try:
+        tagged_data: list[TaggedData] = tagger.tag([text for _, text in batch], preprocessed=batch[0][0].preprocessed)
+        for (issue, _), tagged_page in zip(batch, tagged_data):
+            issue.tagged_data.append(tagged_page)
+        return
+    except Exception as ex:  # pylint: disable=broad-except
+        if len({id(issue) for issue, _ in batch}) == 1:
+            batch[0][0].error = ex
+            return
+
+    for _, issue_batch in itertools.groupby(batch, key=lambda x: id(x[0])):
+        _tag_batch(tagger, list(issue_batch))
+
+
+def group_issues(issues: t.Iterable[PendingIssue], batch_tokens: int = None) -> t.Iterable[list[PendingIssue]]:
+    """Group consecutive issues into groups of about `batch_tokens` tokens (one issue per group if None)."""
+    group: list[PendingIssue] = []
+    n_group_tokens: int = 0
+    for issue in issues:
+        group.append(issue)
+        n_group_tokens += sum(len(text.split()) for text in issue.texts) if batch_tokens else 0
+        if not batch_tokens or n_group_tokens >= batch_tokens:
+            yield group
+            group, n_group_tokens = [], 0
+    if group:
+        yield group
+
+
+_worker_tagger: ITagger = None
+
+
+def _initialize_worker(tagger_factory: t.Callable[[], ITagger], workers: int) -> None:
+    global _worker_tagger
+    _worker_tagger = tagger_factory()
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+
+
+def _tag_issue_group(issues: list[PendingIssue], batch_tokens: int) -> list[tuple[str, TaggedIssue | Exception]]:
+    return list(tag_issue_batches(tagger=_worker_tagger, issues=issues, batch_tokens=batch_tokens))
+
+
+def tag_issue_batches_parallel(
+    *,
+    tagger_factory: t.Callable[[], ITagger],
+    issues: t.Iterable[tuple[str, pd.DataFrame] | PendingIssue],
+    workers: int,
+    batch_tokens: int = None,
+    normalize_chars: None | str | bool = None,
+) -> t.Iterable[tuple[str, TaggedIssue | Exception]]:
+    """Tag issues in a pool of `workers` processes. Yield (title, tagged issue) in issue order.
+
+    Each worker creates one tagger using `tagger_factory`, and tags groups of consecutive issues
+    (see `group_issues`) using `tag_issue_batches`. At most two groups per worker are in flight.
+    Workers are spawned (not forked) so that each gets a clean Torch runtime.
+    """
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=context, initializer=_initialize_worker, initargs=(tagger_factory, workers)
+    ) as executor:
+        futures: deque[Future] = deque()
+        for group in group_issues(prepare_issues(issues, normalize_chars), batch_tokens=batch_tokens):
+            futures.append(executor.submit(_tag_issue_group, group, batch_tokens))
+            while len(futures) >= 2 * workers:
+                yield from futures.popleft().result()
+        while futures:
+            yield from futures.popleft().result()
+
+
+def to_tagged_frame(tagged_data: list[TaggedData], keep_xpos: bool = False) -> pd.DataFrame:
+    """Create one tagged frame from tagged pages. Page `i` gets `document_id` i.
+
+    Columns are concatenated directly from the `TaggedData` lists, so tokens are kept
+    as strings (no type inference) and the frame is indexed by token position within page.
+    The `xpos` column is only included if `keep_xpos` is true.
+    """
+    lengths: np.ndarray = np.array([len(d['token']) for d in tagged_data], dtype=np.int64)
+    offsets: np.ndarray = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    n_total: int = int(lengths.sum())
+
+    data: dict[str, t.Any] = {
+        column: list(itertools.chain.from_iterable(d[column] for d in tagged_data))
+        for column in ['token', 'lemma', 'pos'] + (['xpos'] if keep_xpos else [])
+    }
+    data['document_id'] = np.repeat(np.arange(len(tagged_data), dtype=np.int64), lengths)
+
+    return pd.DataFrame(data=data, index=np.arange(n_total, dtype=np.int64) - offsets)
@@ -4,11 +4,13 @@ import bz2
 import gzip
 import lzma
 import os
+from concurrent.futures import ThreadPoolExecutor
 from os.path import basename, splitext
 from typing import Literal
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
 
 from pybolima.foss.sparv_tokenize import default_tokenize
 
@@ -18,6 +20,30 @@ def pretokenize(text: str) -> str:
     return ' '.join(default_tokenize(text))
 
 
+SENTENCE_DELIMITERS: tuple[str, ...] = ('.', '!', '?')
+
+
+def segment(text: str, max_length: int) -> str:
+    """Split whitespace tokenized `text` into newline separated segments of at most `max_length` tokens.
+
+    A segment ends after the last token within `max_length` that ends a sentence, or is cut
+    at `max_length` tokens if there is no such token. The sequence of tokens is unchanged.
+    """
+    tokens: list[str] = text.split()
+    segments: list[str] = []
+    start: int = 0
+
+    while len(tokens) - start > max_length:
+        end: int = start + max_length
+        cut: int = next((i + 1 for i in range(end - 1, start - 1, -1) if tokens[i].endswith(SENTENCE_DELIMITERS)), end)
+        segments.append(' '.join(tokens[start:cut]))
+        start = cut
+
+    segments.append(' '.join(tokens[start:]))
+
+    return '\n'.join(segments)
+
+
 def strip_path_and_extension(filename: str | list[str]) -> str | list[str]:
     """Remove path and extension from filename(s). Return list."""
     if isinstance(filename, str):
@@ -38,21 +64,66 @@ def replace_extension(filename: str, extension: str) -> str:
     return f"{base}{'' if extension.startswith('.') else '.'}{extension}"
 
 
-def store_str(filename: str, text: str, compress_type: Literal['csv', 'gzip', 'bz2', 'lzma']) -> None:
-    """Stores a textfile on disk - optionally compressed"""
-    modules = {'gzip': (gzip, 'gz'), 'bz2': (bz2, 'bz2'), 'lzma': (lzma, 'xz')}
+ARROW_CODECS: dict[str, str] = {'zstd': 'zst', 'lz4': 'lz4'}
+FRAME_SIZE: int = 1 << 22
+
+
+def store_str(
+    filename: str,
+    text: str,
+    compress_type: Literal['csv', 'gzip', 'bz2', 'lzma', 'zstd', 'lz4'],
+    level: int = None,
+    threads: int = 1,
+) -> str:
+    """Stores a textfile on disk - optionally compressed. Returns name of stored file.
+
+    Args:
+        level (int, optional): Compression level (codec default if None).
+        threads (int, optional): If > 1, zstd and lz4 compress frames of the text in parallel. Defaults to 1.
+    """
+    modules = {
+        'gzip': (gzip, 'gz', 'compresslevel'),
+        'bz2': (bz2, 'bz2', 'compresslevel'),
+        'lzma': (lzma, 'xz', 'preset'),
+    }
 
     if compress_type in modules:
-        module, extension = modules[str(compress_type)]
-        with module.open(f"{filename}.{extension}", 'wb') as fp:
+        module, extension, level_arg = modules[str(compress_type)]
+        filename = f"{filename}.{extension}"
+        with module.open(filename, 'wb', **({level_arg: level} if level is not None else {})) as fp:
             fp.write(text.encode('utf-8'))
 
+    elif compress_type in ARROW_CODECS:
+        filename = f"{filename}.{ARROW_CODECS[compress_type]}"
+        with open(filename, 'wb') as fp:
+            for frame in compress_frames(text.encode('utf-8'), codec=compress_type, level=level, threads=threads):
+                fp.write(frame)
+
     elif compress_type == 'csv':
         with open(filename, 'w', encoding='utf-8') as fp:
             fp.write(text)
     else:
         raise ValueError(f"unknown mode {compress_type}")
 
+    return filename
+
+
+def compress_frames(data: bytes, codec: str, level: int = None, threads: int = 1) -> list[bytes]:
+    """Compress `data` using Arrow `codec` ('zstd' or 'lz4' frame format).
+
+    If `threads` > 1, `data` is split into independent frames of `FRAME_SIZE` bytes that are compressed
+    in parallel. Concatenated frames are valid zstd/lz4 streams (e.g. `zstd -d` and `pa.input_stream`).
+    """
+    compressor: pa.Codec = pa.Codec(codec, compression_level=level)
+
+    if threads <= 1 or len(data) <= FRAME_SIZE:
+        return [compressor.compress(data, asbytes=True)]
+
+    view: memoryview = memoryview(data)
+    chunks: list[memoryview] = [view[i : i + FRAME_SIZE] for i in range(0, len(data), FRAME_SIZE)]
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(lambda chunk: compressor.compress(chunk, asbytes=True), chunks))
+
 
 def trim_series_type(series: pd.Series) -> pd.Series:
     max_value: int = series.max()
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import itertools
+import os
+from collections import defaultdict
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+STRINGS_EXTENSION: str = 'strings'
+OFFSETS_EXTENSION: str = 'offsets'
+
+
+class Vocabulary:
+    """Append-only vocabulary (token to id mapping) with stable ids, persisted as a string table.
+
+    The vocabulary is stored as two files: `<filename>.strings` (UTF-8 encoded tokens, concatenated
+    in id order), and `<filename>.offsets` (int64 offsets of tokens in string table, starting with 0).
+    Both files are only appended to, so ids of stored tokens never change. On load, the files are
+    memory-mapped and wrapped as an Arrow string array, without parsing.
+
+    Stored tokens are kept in that form, and are only hashed (into a `pd.Index`) when first looked up.
+    Tokens added since load are kept in a dict.
+
+    Offsets are written after strings, so a partially written save is ignored (and overwritten) when
+    the vocabulary is loaded.
+    """
+
+    def __init__(self, filename: str = None):
+        self.filename: str = filename
+        self.stored: pa.LargeStringArray = pa.array([], type=pa.large_string())
+        self.added: defaultdict = defaultdict()
+        self.added.default_factory = self.__len__
+        self.n_saved: int = 0
+        self.size: int = 0
+        self._index: pd.Index = None
+
+    def __len__(self) -> int:
+        return len(self.stored) + len(self.added)
+
+    def __getitem__(self, token: str) -> int:
+        """Return id of `token`. Unseen tokens are added."""
+        return int(self.encode([token])[0])
+
+    @property
+    def index(self) -> pd.Index:
+        """Index of stored tokens (in id order), built on first use."""
+        if self._index is None:
+            self._index = pd.Index(self.stored.to_numpy(zero_copy_only=False), dtype=object)
+            if not self._index.is_unique:
+                raise ValueError(f"vocabulary {self.filename} has duplicate tokens")
+        return self._index
+
+    def encode(self, tokens: Iterable[str]) -> np.ndarray:
+        """Return ids (int64) of unique `tokens`. Unseen tokens are added in given order."""
+        tokens = np.asarray(tokens, dtype=object)
+        ids: np.ndarray = self.index.get_indexer(tokens) if len(self.stored) else np.full(len(tokens), -1)
+        for i in np.flatnonzero(ids < 0):
+            ids[i] = self.added[tokens[i]]
+        return ids
+
+    def tokens(self, start: int = 0) -> list[str]:
+        """Return tokens with ids from `start`, in id order."""
+        n_stored: int = len(self.stored)
+        added: list[str] = list(itertools.islice(self.added, max(start - n_stored, 0), None))
+        return (self.stored[start:].to_pylist() if start < n_stored else []) + added
+
+    @property
+    def token2id(self) -> dict[str, int]:
+        """Vocabulary as a dict (built on each call)."""
+        return dict(zip(self.tokens(), range(len(self))))
+
+    @property
+    def strings_filename(self) -> str:
+        return f"{self.filename}.{STRINGS_EXTENSION}"
+
+    @property
+    def offsets_filename(self) -> str:
+        return f"{self.filename}.{OFFSETS_EXTENSION}"
+
+    @staticmethod
+    def load(filename: str) -> "Vocabulary":
+        """Load vocabulary stored as `filename` (empty vocabulary if not stored)."""
+        vocabulary: Vocabulary = Vocabulary(filename)
+        vocabulary.stored = vocabulary.read_strings()
+        vocabulary.n_saved = len(vocabulary.stored)
+        vocabulary.size = (
+            int(np.frombuffer(vocabulary.stored.buffers()[1], dtype=np.int64)[-1]) if len(vocabulary.stored) else 0
+        )
+        return vocabulary
+
+    def read_strings(self) -> pa.LargeStringArray:
+        """Return stored tokens (in id order) as memory-mapped Arrow array."""
+        if not os.path.isfile(self.offsets_filename) or os.path.getsize(self.offsets_filename) < 16:
+            return pa.array([], type=pa.large_string())
+
+        n_offsets: int = os.path.getsize(self.offsets_filename) // 8
+        offsets: np.ndarray = np.memmap(self.offsets_filename, dtype=np.int64, mode='r', shape=(n_offsets,))
+        strings: np.ndarray = (
+            np.memmap(self.strings_filename, dtype=np.uint8, mode='r')
+            if offsets[-1] > 0
+            else np.zeros(0, dtype=np.uint8)
+        )
+
+        return pa.LargeStringArray.from_buffers(len(offsets) - 1, pa.py_buffer(offsets), pa.py_buffer(strings))
+
+    def save(self) -> None:
+        """Append tokens added since vocabulary was loaded (or last saved) to stored vocabulary.
+
+        Raises:
+            ValueError: If a token is not a string (e.g. NaN), since it can't be loaded as the same token.
+        """
+        if self.filename is None:
+            raise ValueError("vocabulary has no filename")
+
+        n_new: int = len(self) - self.n_saved
+        if n_new == 0 and os.path.isfile(self.offsets_filename):
+            return
+
+        tokens: list[str] = self.tokens(self.n_saved)
+        if not all(isinstance(token, str) for token in tokens):
+            raise ValueError(f"vocabulary can only store strings: {[t for t in tokens if not isinstance(t, str)]}")
+        data: list[bytes] = [token.encode('utf-8') for token in tokens]
+        offsets: np.ndarray = self.size + np.cumsum([len(x) for x in data], dtype=np.int64)
+
+        with open(self.strings_filename, 'ab') as fp:
+            fp.truncate(self.size)
+            fp.write(b''.join(data))
+
+        with open(self.offsets_filename, 'ab') as fp:
+            fp.truncate(8 * self.n_saved + 8 if self.n_saved else 0)
+            if not self.n_saved:
+                fp.write(np.zeros(1, dtype=np.int64).tobytes())
+            fp.write(offsets.tobytes())
+
+        self.n_saved = len(self)
+        self.size = int(offsets[-1]) if n_new else self.size
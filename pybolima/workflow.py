@@ -1,14 +1,20 @@
 from __future__ import annotations
 
+import json
 import os
 import shutil
+from functools import partial
 from os.path import isdir, isfile
+from typing import Callable
 
 import pandas as pd
 
-from pybolima.dispatch import DispatchOptions, IdTaggedFramePerGroupDispatcher, TaggedFramePerGroupDispatcher
-from pybolima.stanza import ITagger, StanzaTagger
-from pybolima.tagger import tag_issues
+from pybolima.cache import CachedTagger
+from pybolima.dispatch import DispatchOptions, RawTaggedFrameDispatcher, get_dispatcher_class
+from pybolima.interface import RAW_STORE_FILENAME
+from pybolima.merge import merge_shards
+from pybolima.stanza import ITagger, StanzaTagger, stanza_config
+from pybolima.tagger import dispatch_raw_issues, tag_issues
 from pybolima.utility import pretokenize
 
 DEFAULT_MODEL_ROOT: str = "/data/sparv/models/stanza"
@@ -31,21 +37,67 @@ def tag_bolima(
     skip_stopwords: bool = False,
     skip_puncts: bool = True,
     skip_lemma: bool = False,
+    compress_level: int = None,
+    compress_threads: int = 1,
+    feather_compression: str = None,
+    write_threads: int = 0,
+    vocabulary: str = None,
     model_root: str = DEFAULT_MODEL_ROOT,
+    chunksize: int = None,
+    years: tuple[int, int] = None,
+    titles: list[str] = None,
+    cache_folder: str = None,
+    memory_map: bool = False,
+    batch_tokens: int = None,
+    token_budget: int = None,
+    max_segment_length: int = None,
+    workers: int = 1,
+    queue_size: int = 0,
+    checkpoint: bool = True,
+    resume: bool = False,
+    tag_cache: str = None,
+    tag_cache_size: int = None,
+    tag_cache_only: bool = False,
+    raw_store: str = None,
 ):
+    """Tag BLM corpus `source_filename` and store result in `target_folder`.
+
+    If `checkpoint` is true, each dispatched issue is recorded in a journal in `target_folder`. An
+    interrupted run can then be continued with `resume`, which skips already dispatched issues and
+    restores document ids, document index and vocabulary so that output equals an uninterrupted run.
+    The journal is removed when the run completes. Journaling syncs a record to disk per issue, so
+    disable it for faster runs (e.g. on network file systems) that need not be resumable.
+
+    If `tag_cache` is set, tagged pages are stored in (and looked up from) this SQLite file. The cache
+    is bounded to `tag_cache_size` bytes if given. With `tag_cache_only`, the Stanza model is never
+    loaded and issues having pages missing in the cache fail.
+
+    If `raw_store` is set, issues are first tagged to this raw tagged store (see `RawTaggedFrameDispatcher`),
+    which is then dispatched to `target_folder` (see `dispatch_bolima`). Issues already in the store
+    are not tagged again. The store records the tagger config, source file and year/title filters it was
+    tagged with, and a store tagged with other settings is only replaced (re-tagged) if `force` is true.
+
+    If `write_threads` > 0, output files are written by this many background threads, overlapping
+    writing and compression with processing of the next issues.
+
+    If `vocabulary` is set, codified output uses (and extends) this persistent vocabulary (see
+    `Vocabulary`), so that token ids are stable between runs.
+    """
     if not isfile(source_filename):
         raise FileNotFoundError(source_filename)
 
-    if isdir(target_folder):
-        if force:
-            shutil.rmtree(target_folder, ignore_errors=True)
-        else:
-            raise WorkFlowError("target folder exists")
+    prepare_target_folder(target_folder, force=force, resume=resume)
 
-    os.makedirs(target_folder)
+    tagger_config: dict = stanza_config(
+        model=model_root or DEFAULT_MODEL_ROOT,
+        lang="sv",
+        processors="tokenize,lemma,pos",
+        tokenize_pretokenized=True,
+        tokenize_no_ssplit=True,
+    )
 
-    dispatch_cls = IdTaggedFramePerGroupDispatcher if numeric_frame else TaggedFramePerGroupDispatcher
-    tagger: ITagger = StanzaTagger(
+    tagger_factory: Callable[[], ITagger] = partial(
+        StanzaTagger,
         model=model_root or DEFAULT_MODEL_ROOT,
         preprocessors=[pretokenize],
         processors="tokenize,lemma,pos",
@@ -53,7 +105,22 @@ def tag_bolima(
         lang="sv",
         tokenize_no_ssplit=True,
         use_gpu=True,
+        token_budget=token_budget,
+        max_segment_length=max_segment_length,
     )
+
+    if tag_cache:
+        tagger_factory = partial(
+            CachedTagger,
+            filename=tag_cache,
+            tagger=tagger_factory,
+            config=tagger_config,
+            preprocessors=[pretokenize],
+            max_segment_length=max_segment_length,
+            max_size=tag_cache_size,
+            cache_only=tag_cache_only,
+        )
+
     opts: DispatchOptions = DispatchOptions(
         compress_type=compress_type,
         to_lower=to_lower,
@@ -61,6 +128,176 @@ def tag_bolima(
         skip_stopwords=skip_stopwords,
         skip_puncts=skip_puncts,
         skip_lemma=skip_lemma,
+        compress_level=compress_level,
+        compress_threads=compress_threads,
+        feather_compression=feather_compression,
+        write_threads=write_threads,
+        vocabulary=vocabulary,
+        checkpoint=checkpoint,
+        resume=resume,
+    )
+
+    if raw_store:
+        prepare_raw_store(
+            raw_store,
+            settings=dict(
+                tagger=tagger_config,
+                max_segment_length=max_segment_length,
+                source=source_identity(source_filename),
+                years=years,
+                titles=titles,
+            ),
+            force=force,
+        )
+
+    tag_issues(
+        tagger_factory,
+        source=source_filename,
+        target=raw_store or target_folder,
+        dispatch_cls=RawTaggedFrameDispatcher if raw_store else get_dispatcher_class(numeric_frame, compress_type),
+        dispatch_opts=DispatchOptions(checkpoint=True, resume=True, write_threads=write_threads) if raw_store else opts,
+        chunksize=chunksize,
+        years=years,
+        titles=titles,
+        cache_folder=cache_folder,
+        memory_map=memory_map,
+        batch_tokens=batch_tokens,
+        workers=workers,
+        queue_size=queue_size,
     )
 
-    tag_issues(tagger, source=source_filename, target=target_folder, dispatch_cls=dispatch_cls, dispatch_opts=opts)
+    if raw_store:
+        dispatch_raw_issues(
+            source=raw_store,
+            target=target_folder,
+            dispatch_cls=get_dispatcher_class(numeric_frame, compress_type),
+            dispatch_opts=opts,
+            years=years,
+            titles=titles,
+            queue_size=queue_size,
+        )
+
+
+def dispatch_bolima(
+    numeric_frame: bool,
+    source_folder: str,
+    target_folder: str,
+    force: bool = False,
+    compress_type: str = 'feather',
+    to_lower: bool = True,
+    skip_text: bool = True,
+    skip_stopwords: bool = False,
+    skip_puncts: bool = True,
+    skip_lemma: bool = False,
+    compress_level: int = None,
+    compress_threads: int = 1,
+    feather_compression: str = None,
+    write_threads: int = 0,
+    vocabulary: str = None,
+    years: tuple[int, int] = None,
+    titles: list[str] = None,
+    queue_size: int = 0,
+    checkpoint: bool = True,
+    resume: bool = False,
+):
+    """Dispatch raw tagged store `source_folder` (see `tag_bolima`) to `target_folder`, without tagging."""
+    if not isdir(source_folder):
+        raise FileNotFoundError(source_folder)
+
+    prepare_target_folder(target_folder, force=force, resume=resume)
+
+    dispatch_raw_issues(
+        source=source_folder,
+        target=target_folder,
+        dispatch_cls=get_dispatcher_class(numeric_frame, compress_type),
+        dispatch_opts=DispatchOptions(
+            compress_type=compress_type,
+            to_lower=to_lower,
+            skip_text=skip_text,
+            skip_stopwords=skip_stopwords,
+            skip_puncts=skip_puncts,
+            skip_lemma=skip_lemma,
+            compress_level=compress_level,
+            compress_threads=compress_threads,
+            feather_compression=feather_compression,
+            write_threads=write_threads,
+            vocabulary=vocabulary,
+            checkpoint=checkpoint,
+            resume=resume,
+        ),
+        years=years,
+        titles=titles,
+        queue_size=queue_size,
+    )
+
+
+def merge_bolima(
+    source_folders: list[str],
+    target_folder: str,
+    force: bool = False,
+    compress_type: str = 'feather',
+    compress_level: int = None,
+    compress_threads: int = 1,
+    feather_compression: str = None,
+    write_threads: int = 0,
+):
+    """Merge outputs of runs over consecutive parts of the corpus (e.g. by year or title) into `target_folder`.
+
+    Document ids and (codified output) vocabulary ids are remapped to the ids of a single run (see `merge_shards`).
+    Only folder outputs (one file per issue) can be merged, i.e. `compress_type` can't be 'parquet' or 'zip'.
+    """
+    for source_folder in source_folders:
+        if not isdir(source_folder):
+            raise FileNotFoundError(source_folder)
+
+    prepare_target_folder(target_folder, force=force, resume=False)
+
+    merge_shards(
+        sources=source_folders,
+        target=target_folder,
+        opts=DispatchOptions(
+            compress_type=compress_type,
+            compress_level=compress_level,
+            compress_threads=compress_threads,
+            feather_compression=feather_compression,
+            write_threads=write_threads,
+        ),
+    )
+
+
+def source_identity(filename: str) -> dict:
+    return dict(filename=os.path.basename(filename), size=os.path.getsize(filename), mtime=os.path.getmtime(filename))
+
+
+def prepare_raw_store(raw_store: str, settings: dict, force: bool) -> None:
+    """Create raw tagged store `raw_store` tagged with `settings`, or check that existing store has same settings.
+
+    An existing store having other (or unknown) settings is removed if `force` is true, else an error is raised.
+    """
+    settings = json.loads(json.dumps(settings))
+    filename: str = os.path.join(raw_store, RAW_STORE_FILENAME)
+
+    if isdir(raw_store) and os.listdir(raw_store):
+        stored_settings: dict = None
+        if isfile(filename):
+            with open(filename, 'r', encoding='utf-8') as fp:
+                stored_settings = json.load(fp)
+        if stored_settings == settings:
+            return
+        if not force:
+            raise WorkFlowError(f"raw store {raw_store} was tagged with other settings (use force to re-tag)")
+        shutil.rmtree(raw_store, ignore_errors=True)
+
+    os.makedirs(raw_store, exist_ok=True)
+    with open(filename, 'w', encoding='utf-8') as fp:
+        json.dump(settings, fp, indent=4)
+
+
+def prepare_target_folder(target_folder: str, force: bool, resume: bool) -> None:
+    if isdir(target_folder) and not resume:
+        if force:
+            shutil.rmtree(target_folder, ignore_errors=True)
+        else:
+            raise WorkFlowError("target folder exists")
+
+    os.makedirs(target_folder, exist_ok=True)
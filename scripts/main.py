@@ -1,5 +1,6 @@
 from __future__ import annotations
 import sys
+from os.path import isdir
 
 import click
 
@@ -10,28 +11,100 @@ from pybolima import workflow
 @click.argument('source_filename', type=click.STRING)
 @click.argument('target_folder', type=click.STRING)
 @click.option('--codify', type=click.BOOL, is_flag=True, help='Codified frame', default=True)
-@click.option('--force', type=click.BOOL, is_flag=True, help='Force overwrite', default=False)
+@click.option('--force', type=click.BOOL, is_flag=True, help='Force overwrite (and re-tag raw store)', default=False)
 @click.option('--compress-type', type=click.STRING, help='Storage format', default='feather')
+@click.option('--compress-level', type=click.INT, help='Compression level (codec default if not set)', default=None)
+@click.option('--compress-threads', type=click.INT, help='Threads used for zstd/lz4 compression', default=1)
+@click.option('--feather-compression', type=click.Choice(['zstd', 'lz4', 'uncompressed']), default=None)
+@click.option('--vocabulary', type=click.STRING, help='Load and extend persistent vocabulary (codified frame)')
+@click.option('--write-threads', type=click.INT, help='Write output files in N background threads', default=0)
 @click.option('--to-lower', type=click.BOOL, is_flag=True, help='Lowercase tokens', default=True)
 @click.option('--skip-text', type=click.BOOL, is_flag=True, help='Skip text column', default=True)
 @click.option('--skip-stopwords', type=click.BOOL, is_flag=True, help='Skip stopwords', default=False)
 @click.option('--skip-puncts', type=click.BOOL, is_flag=True, help='Skip punctuations', default=True)
 @click.option('--skip-lemma', type=click.BOOL, is_flag=True, help='Skip lemma', default=False)
 @click.option('--model-root', type=click.STRING, default=workflow.DEFAULT_MODEL_ROOT)
+@click.option('--chunksize', type=click.INT, help='Stream source in chunks of this many rows', default=None)
+@click.option('--from-year', type=click.INT, help='Only tag issues published this year or later', default=None)
+@click.option('--to-year', type=click.INT, help='Only tag issues published this year or earlier', default=None)
+@click.option('--title', 'titles', type=click.STRING, multiple=True, help='Only tag issue(s) with given title')
+@click.option('--cache-folder', type=click.STRING, help='Cache CSV source as feather in this folder', default=None)
+@click.option('--memory-map', type=click.BOOL, is_flag=True, help='Memory-map feather source', default=False)
+@click.option('--batch-tokens', type=click.INT, help='Tag pages of consecutive issues in batches of N tokens')
+@click.option('--token-budget', type=click.INT, help='Pass length sorted pages to Stanza in batches of N tokens')
+@click.option('--max-segment-length', type=click.INT, help='Tag pages in segments of at most N tokens')
+@click.option('--workers', type=click.INT, help='Number of tagging processes', default=1)
+@click.option('--queue-size', type=click.INT, help='Overlap load, tag and dispatch using queues of N issues', default=0)
+@click.option('--tag-cache', type=click.STRING, help='Cache tagged pages in this SQLite file', default=None)
+@click.option('--tag-cache-size', type=click.INT, help='Max size (MB) of tagged pages cache', default=None)
+@click.option('--tag-cache-only', type=click.BOOL, is_flag=True, help='Only use cached pages (no model)', default=False)
+@click.option('--raw-store', type=click.STRING, help='Tag to (or reuse) raw tagged store in this folder', default=None)
+@click.option('--checkpoint/--no-checkpoint', help='Journal dispatched issues so that run can be resumed', default=True)
+@click.option('--resume', type=click.BOOL, is_flag=True, help='Resume interrupted run in target folder', default=False)
 def main(
     source_filename: str,
     target_folder: str,
     codify: bool = True,
     force: bool = False,
     compress_type: str = 'feather',
+    compress_level: int = None,
+    compress_threads: int = 1,
+    feather_compression: str = None,
+    write_threads: int = 0,
+    vocabulary: str = None,
     to_lower: bool = True,
     skip_text: bool = True,
     skip_stopwords: bool = False,
     skip_puncts: bool = True,
     skip_lemma: bool = False,
     model_root: str = None,
+    chunksize: int = None,
+    from_year: int = None,
+    to_year: int = None,
+    titles: tuple[str] = (),
+    cache_folder: str = None,
+    memory_map: bool = False,
+    batch_tokens: int = None,
+    token_budget: int = None,
+    max_segment_length: int = None,
+    workers: int = 1,
+    queue_size: int = 0,
+    tag_cache: str = None,
+    tag_cache_size: int = None,
+    tag_cache_only: bool = False,
+    raw_store: str = None,
+    checkpoint: bool = True,
+    resume: bool = False,
 ) -> None:
+    """Tag BLM corpus SOURCE_FILENAME to TARGET_FOLDER. If SOURCE_FILENAME is a raw tagged store
+    (folder), its tagged issues are dispatched to TARGET_FOLDER without tagging."""
     try:
+        years: tuple[int, int] = None if from_year is None and to_year is None else (from_year or 0, to_year or 9999)
+
+        if isdir(source_filename):
+            workflow.dispatch_bolima(
+                source_folder=source_filename,
+                target_folder=target_folder,
+                numeric_frame=codify,
+                force=force,
+                compress_type=compress_type,
+                compress_level=compress_level,
+                compress_threads=compress_threads,
+                feather_compression=feather_compression,
+                write_threads=write_threads,
+                vocabulary=vocabulary,
+                to_lower=to_lower,
+                skip_text=skip_text,
+                skip_stopwords=skip_stopwords,
+                skip_puncts=skip_puncts,
+                skip_lemma=skip_lemma,
+                years=years,
+                titles=list(titles) or None,
+                queue_size=queue_size,
+                checkpoint=checkpoint,
+                resume=resume,
+            )
+            return
 
         workflow.tag_bolima(
             source_filename=source_filename,
@@ -39,12 +112,33 @@ def main(
             numeric_frame=codify,
             force=force,
             compress_type=compress_type,
+            compress_level=compress_level,
+            compress_threads=compress_threads,
+            feather_compression=feather_compression,
+            write_threads=write_threads,
+            vocabulary=vocabulary,
             to_lower=to_lower,
             skip_text=skip_text,
             skip_stopwords=skip_stopwords,
             skip_puncts=skip_puncts,
             skip_lemma=skip_lemma,
             model_root=model_root,
+            chunksize=chunksize,
+            years=years,
+            titles=list(titles) or None,
+            cache_folder=cache_folder,
+            memory_map=memory_map,
+            batch_tokens=batch_tokens,
+            token_budget=token_budget,
+            max_segment_length=max_segment_length,
+            workers=workers,
+            queue_size=queue_size,
+            checkpoint=checkpoint,
+            resume=resume,
+            tag_cache=tag_cache,
+            tag_cache_size=tag_cache_size * 1024 * 1024 if tag_cache_size else None,
+            tag_cache_only=tag_cache_only,
+            raw_store=raw_store,
         )
 
     except Exception as ex:
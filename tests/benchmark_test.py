@@ -0,0 +1,191 @@
+import os
+import time
+import tracemalloc
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pybolima.dispatch import DispatchOptions, IdTaggedFramePerGroupDispatcher, TaggedFramePerGroupDispatcher
+from pybolima.interface import TaggedIssue
+from pybolima.load import partition_issues
+from pybolima.stanza import ITagger, TaggedData
+from pybolima.tagger import to_tagged_frame
+from pybolima.utility import store_str
+from pybolima.vocabulary import Vocabulary
+
+from .dispatch_test import process_by_masks
+
+# pylint: disable=redefined-outer-name
+
+
+def create_corpus(n_issues: int, n_pages: int = 20) -> pd.DataFrame:
+    titles: list[str] = [f"BLM-{1930 + i % 60}:{i}" for i in range(n_issues)]
+    corpus: pd.DataFrame = pd.DataFrame(
+        data={
+            'title': np.repeat(titles, n_pages),
+            'page': np.tile(np.arange(1, n_pages + 1), n_issues),
+            'text': 'hej hopp',
+        }
+    )
+    return corpus.sample(frac=1.0, random_state=42).reset_index(drop=True)
+
+
+def elapsed(fx) -> float:
+    start: float = time.perf_counter()
+    fx()
+    return time.perf_counter() - start
+
+
+@pytest.mark.slow
+def test_benchmark_partition_issues_scales_linearly():
+    timings: dict[int, float] = {}
+    for n_issues in [500, 2000, 8000]:
+        corpus: pd.DataFrame = create_corpus(n_issues)
+        timings[n_issues] = elapsed(lambda c=corpus: sum(1 for _ in partition_issues(c)))
+        print(f"partition_issues: {n_issues:>5} issues {len(corpus):>7} pages {timings[n_issues]:.3f}s")
+
+    assert timings[8000] / timings[500] < 16 * 3
+
+
+def tagged_frame_by_tsv(tagged_data: list[TaggedData]) -> pd.DataFrame:
+    """Previous implementation of tag_issue's frame construction (TSV round trip per page)"""
+    tagged_pages: list[pd.DataFrame] = []
+    for i, tagged_page in enumerate(tagged_data):
+        tagged_page: pd.DataFrame = pd.read_csv(StringIO(ITagger.to_csv(tagged_page)), sep='\t', quoting=3)
+        tagged_page['document_id'] = i
+        tagged_page.drop(columns="xpos", inplace=True)
+        tagged_pages.append(tagged_page)
+    return pd.concat(tagged_pages)
+
+
+@pytest.mark.slow
+def test_benchmark_to_tagged_frame(tagged_issues: list[TaggedIssue]):
+    tagged_data: list[TaggedData] = [
+        dict(token=page.token.tolist(), lemma=page.lemma.tolist(), pos=page.pos.tolist(), xpos=page.pos.tolist())
+        for tagged_issue in tagged_issues
+        for _, page in tagged_issue.tagged_frame.groupby('document_id')
+    ] * 25
+
+    tsv_time: float = elapsed(lambda: tagged_frame_by_tsv(tagged_data))
+    direct_time: float = elapsed(lambda: to_tagged_frame(tagged_data))
+
+    print(f"\ntagged frame: {len(tagged_data)} pages TSV round trip {tsv_time:.3f}s direct {direct_time:.3f}s")
+    assert direct_time < tsv_time
+
+
+def encode_by_apply(dispatcher: IdTaggedFramePerGroupDispatcher, tagged_frame: pd.DataFrame) -> pd.DataFrame:
+    """Previous implementation of IdTaggedFramePerGroupDispatcher's encoding (one Python call per token)"""
+    fg = lambda t: dispatcher.vocabulary.added[t]
+    tagged_frame['token_id'] = tagged_frame.token.apply(fg)
+    tagged_frame['lemma_id'] = tagged_frame.lemma.apply(fg)
+    tagged_frame['pos_id'] = tagged_frame.pos.apply(dispatcher.pos_schema.pos_to_id.get).astype(np.int8)
+    return tagged_frame
+
+
+@pytest.mark.slow
+def test_benchmark_vocabulary_encoding(tagged_issues: list[TaggedIssue]):
+    tagged_frame: pd.DataFrame = pd.concat([tagged_issue.tagged_frame for tagged_issue in tagged_issues] * 200)
+    tagged_frame = tagged_frame.assign(lemma=tagged_frame.lemma.fillna('')).reset_index(drop=True)
+    opts: DispatchOptions = DispatchOptions(skip_text=False)
+
+    dispatcher: IdTaggedFramePerGroupDispatcher = IdTaggedFramePerGroupDispatcher(target='tests/output', opts=opts)
+    apply_time: float = elapsed(lambda: encode_by_apply(dispatcher, tagged_frame.copy()))
+
+    other: IdTaggedFramePerGroupDispatcher = IdTaggedFramePerGroupDispatcher(target='tests/output', opts=opts)
+    vectorized_time: float = elapsed(
+        lambda: (other.encode(tagged_frame.token), other.encode(tagged_frame.lemma), other.encode_pos(tagged_frame.pos))
+    )
+
+    print(
+        f"\nencoding: {len(tagged_frame)} tokens apply {len(tagged_frame) / apply_time:.0f} tokens/s "
+        f"vectorized {len(tagged_frame) / vectorized_time:.0f} tokens/s"
+    )
+    assert list(other.token2id.items()) == list(dispatcher.token2id.items())
+    assert vectorized_time < apply_time
+
+
+def peak_memory(fx) -> int:
+    tracemalloc.start()
+    fx()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize('skip_text,skip_stopwords', [(True, False), (False, True)])
+def test_benchmark_process_memory_and_time(tagged_issues: list[TaggedIssue], skip_text: bool, skip_stopwords: bool):
+    tagged_frame: pd.DataFrame = pd.concat([tagged_issue.tagged_frame for tagged_issue in tagged_issues] * 50)
+    item: TaggedIssue = TaggedIssue(title="BLM-1943:1", document_index=None, tagged_frame=tagged_frame)
+    dispatcher: TaggedFramePerGroupDispatcher = TaggedFramePerGroupDispatcher(
+        target='tests/output', opts=DispatchOptions(skip_text=skip_text, skip_stopwords=skip_stopwords)
+    )
+
+    masks_peak: int = peak_memory(lambda: process_by_masks(dispatcher, item))
+    fused_peak: int = peak_memory(lambda: dispatcher.process(item))
+    masks_time: float = elapsed(lambda: process_by_masks(dispatcher, item))
+    fused_time: float = elapsed(lambda: dispatcher.process(item))
+
+    print(
+        f"\nprocess: {len(tagged_frame)} tokens peak memory masks {masks_peak / 2**20:.1f} MB "
+        f"fused {fused_peak / 2**20:.1f} MB, time masks {masks_time:.3f}s fused {fused_time:.3f}s"
+    )
+    assert fused_peak < masks_peak
+
+
+@pytest.mark.slow
+def test_benchmark_codecs(tagged_issues: list[TaggedIssue]):
+    tagged_frame: pd.DataFrame = pd.concat([tagged_issue.tagged_frame for tagged_issue in tagged_issues] * 400)
+    text: str = tagged_frame.sample(frac=1.0, random_state=42).to_csv(sep='\t')
+    size: int = len(text.encode('utf-8'))
+    codecs: list[tuple[str, int, int]] = [
+        ('gzip', None, 1),
+        ('bz2', None, 1),
+        ('lzma', None, 1),
+        ('lz4', None, 1),
+        ('zstd', 1, 1),
+        ('zstd', 3, 1),
+        ('zstd', 9, 1),
+        ('zstd', 19, 1),
+        ('zstd', 3, 4),
+        ('zstd', 9, 4),
+    ]
+
+    print(f"\n{'codec':<6} {'level':>5} {'threads':>7} {'ratio':>6} {'MB/s':>8}   ({size / 2**20:.1f} MB TSV)")
+    for compress_type, level, threads in codecs:
+        filename: str = f'tests/output/benchmark_codecs_{compress_type}_{level}_{threads}.csv'
+        start: float = time.perf_counter()
+        filename = store_str(filename, text, compress_type=compress_type, level=level, threads=threads)
+        seconds: float = time.perf_counter() - start
+        ratio: float = size / os.path.getsize(filename)
+        print(f"{compress_type:<6} {str(level or '-'):>5} {threads:>7} {ratio:>6.2f} {size / 2**20 / seconds:>8.1f}")
+
+
+@pytest.mark.slow
+def test_benchmark_vocabulary_load():
+    filename: str = 'tests/output/benchmark_vocabulary'
+    for extension in ['strings', 'offsets']:
+        if os.path.isfile(f"{filename}.{extension}"):
+            os.remove(f"{filename}.{extension}")
+
+    vocabulary: Vocabulary = Vocabulary(filename)
+    for i in range(2_000_000):
+        _ = vocabulary[f"token_{i}"]
+    vocabulary.save()
+
+    tokens: pd.DataFrame = pd.DataFrame({'token': vocabulary.token2id.keys(), 'token_id': vocabulary.token2id.values()})
+    tokens.to_csv(f"{filename}.csv", sep='\t')
+
+    mmap_time: float = elapsed(lambda: Vocabulary.load(filename))
+    csv_time: float = elapsed(lambda: dict(zip(*pd.read_csv(f"{filename}.csv", sep='\t', index_col=0).T.values)))
+    print(f"\nvocabulary: {len(vocabulary)} tokens load string table {mmap_time:.3f}s token2id.csv {csv_time:.3f}s")
+
+    assert mmap_time < csv_time
+    assert mmap_time < 0.1
+
+    vocabulary = Vocabulary.load(filename)
+    lookup_time: float = elapsed(lambda: vocabulary.encode(['token_0', 'token_1999999', 'new']))
+    print(f"vocabulary: first lookup (builds index) {lookup_time:.3f}s")
+    assert vocabulary.encode(['token_1999999', 'new', 'newer']).tolist() == [1_999_999, 2_000_000, 2_000_001]
@@ -0,0 +1,98 @@
+import os
+import uuid
+from functools import partial
+
+import pytest
+
+from pybolima.cache import CachedTagger, CacheMissError, TaggedPageCache
+from pybolima.dispatch import DispatchOptions
+from pybolima.load import load_bolima
+from pybolima.stanza import TaggedData
+from pybolima.utility import pretokenize
+
+from . import SAMPLE_CORPUS_FILENAME
+from .conftest import SimpleTagger
+from .tag_test import FailingTagger, assert_same_output, tag_sample_corpus
+
+
+def cache_filename() -> str:
+    return f'tests/output/{str(uuid.uuid4())[:8]}.sqlite'
+
+
+def test_cached_tagger_tags_missing_pages_only():
+    texts: list[str] = load_bolima(SAMPLE_CORPUS_FILENAME).text.tolist()
+    expected: list[TaggedData] = SimpleTagger(preprocessors=[pretokenize]).tag(texts)
+
+    filename: str = cache_filename()
+    tagger: FailingTagger = FailingTagger()
+    cached_tagger: CachedTagger = CachedTagger(filename, tagger=tagger)
+
+    assert cached_tagger.tag(texts[:2]) == expected[:2]
+    assert cached_tagger.tag(texts) == expected
+    assert tagger.batch_sizes == [2, len(texts) - 2]
+    assert cached_tagger.cache_stats.n_hits == 2
+    assert cached_tagger.cache_stats.n_misses == len(texts)
+
+    other_tagger: CachedTagger = CachedTagger(filename, tagger=None, config=tagger.config, preprocessors=[pretokenize])
+    assert other_tagger.tag(texts) == expected
+    assert other_tagger.cache_stats.hit_ratio == 1.0
+
+
+def test_cached_tagger_keys_depend_on_config():
+    filename: str = cache_filename()
+    CachedTagger(filename, tagger=SimpleTagger(preprocessors=[pretokenize])).tag(["a b c"])
+
+    with pytest.raises(CacheMissError):
+        CachedTagger(filename, config={'tagger': 'other'}, cache_only=True).tag(["a b c"])
+
+
+def test_cached_tagger_calls_factory_on_first_miss_only():
+    filename: str = cache_filename()
+    config: dict = {'tagger': 'SimpleTagger'}
+    factory_calls: list[int] = []
+
+    def factory() -> SimpleTagger:
+        factory_calls.append(1)
+        return SimpleTagger()
+
+    CachedTagger(filename, tagger=factory, config=config).tag(["a b", "c d"])
+    assert len(factory_calls) == 1
+
+    CachedTagger(filename, tagger=factory, config=config).tag(["c d", "a b"])
+    assert len(factory_calls) == 1
+
+
+def test_cache_evicts_least_recently_used_pages():
+    cache: TaggedPageCache = TaggedPageCache(cache_filename())
+    items: dict[bytes, TaggedData] = {f"{i:04}".encode(): dict(token=[str(i)] * 100) for i in range(20)}
+    for key, data in items.items():
+        cache.put_many({key: data})
+    page_size: int = cache.size // 20
+
+    cache.max_size = 10 * page_size
+    cache.get_many([b"0000"])
+    cache.put_many({b"0020": dict(token=['x'])})
+
+    assert cache.size <= cache.max_size
+    assert cache.stats.n_evicted > 0
+    assert set(cache.get_many([b"0000", b"0001", b"0020"])) == {b"0000", b"0020"}
+
+
+def test_tag_issues_with_cache_equals_uncached():
+    filename: str = cache_filename()
+    expected: str = tag_sample_corpus()
+
+    assert_same_output(expected, tag_sample_corpus(tagger=CachedTagger(filename, tagger=FailingTagger())))
+
+    tagger: CachedTagger = partial(
+        CachedTagger, filename, config=FailingTagger().config, preprocessors=[pretokenize], cache_only=True
+    )
+    assert_same_output(expected, tag_sample_corpus(tagger=tagger, workers=2))
+
+
+def test_tag_issues_with_cache_only_skips_uncached_issues():
+    tagger: CachedTagger = CachedTagger(cache_filename(), config={'tagger': 'empty'}, cache_only=True)
+    target: str = tag_sample_corpus(tagger=tagger, dispatch_opts=DispatchOptions(compress_type='csv'))
+
+    assert not [x for x in os.listdir(target) if x.startswith('BLM-')]
+    assert tagger.cache_stats.n_hits == 0
@@ -6,6 +6,8 @@ import pandas as pd
 from pytest import fixture
 
 from pybolima.interface import TaggedIssue
+from pybolima.stanza import ITagger, TaggedData
+from pybolima.utility import pretokenize
 
 from . import SAMPLE_CORPUS_FILENAME
 
@@ -13,6 +15,25 @@ if not isdir(jj("tests", "output")):
     os.makedirs(jj("tests", "output"))
 
 
+class SimpleTagger(ITagger):
+    """Model free tagger: whitespace tokens, lowercase lemmas, MID for tokens without alphanumerics"""
+
+    def _tag(self, text: list[str]) -> list[TaggedData]:
+        return [self._to_dict(d) for d in text]
+
+    def _to_dict(self, tagged_document: str) -> TaggedData:
+        tokens: list[str] = tagged_document.split()
+        pos: list[str] = ['NN' if any(c.isalnum() for c in token) else 'MID' for token in tokens]
+        return dict(
+            token=tokens,
+            lemma=[token.lower() for token in tokens],
+            pos=pos,
+            xpos=pos,
+            n_tokens=len(tokens),
+            n_words=len(tokens),
+        )
+
+
 @fixture
 def bolima_corpus_sample_corpus():
     data: pd.DataFrame = pd.read_csv(SAMPLE_CORPUS_FILENAME, sep='\t', index_col=0)
@@ -22,3 +43,8 @@ def bolima_corpus_sample_corpus():
 @fixture
 def tagged_issues() -> list[TaggedIssue]:
     return TaggedIssue.load_all("tests/test_data")
+
+
+@fixture
+def simple_tagger() -> ITagger:
+    return SimpleTagger(preprocessors=[pretokenize])
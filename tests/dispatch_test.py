@@ -1,13 +1,51 @@
+import glob
+import os
 import uuid
+import zipfile
+from collections import defaultdict
 from os.path import isfile, join
 
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
 import pytest
 
-from pybolima.dispatch import DispatchOptions, TaggedFramePerGroupDispatcher
-from pybolima.interface import TaggedIssue
+from pybolima.checkpoint import CheckpointJournal
+from pybolima.dispatch import (
+    CHECKPOINT_FILENAME,
+    DOCUMENT_INDEX_STREAM,
+    DispatchOptions,
+    IdTaggedFramePerGroupDispatcher,
+    RawTaggedFrameDispatcher,
+    TaggedFramePerGroupDispatcher,
+    get_dispatcher_class,
+)
+from pybolima.foss.stopwords import STOPWORDS
+from pybolima.interface import (
+    ARCHIVE_FILENAME,
+    DATASET_FOLDER,
+    RAW_STORE_FILENAME,
+    RAW_TITLES_FILENAME,
+    CompressType,
+    TaggedIssue,
+)
+from pybolima.load import (
+    TaggedArchive,
+    raw_store_titles,
+    read_raw_issue,
+    read_tagged_dataset,
+    read_tagged_frame,
+    widen_tagged_frame,
+)
+from pybolima.merge import merge_shards, read_stored
+from pybolima.stanza import TaggedData
+from pybolima.tagger import dispatch_raw_issues
 from pybolima.transform import normalize_characters
-from pybolima.utility import replace_extension
-from pybolima.workflow import tag_bolima
+from pybolima.utility import pretokenize, replace_extension
+from pybolima.workflow import WorkFlowError, prepare_raw_store, tag_bolima
+
+from .conftest import SimpleTagger
+from .tag_test import FailingTagger, assert_same_output, create_issues, tag_sample_corpus
 
 # pylint: disable=redefined-outer-name
 
@@ -67,3 +105,421 @@ def test_workflow():
     }
 
     tag_bolima(**args)
+
+
+def test_id_dispatcher_encodes_as_mapping_each_token(tagged_issues: list[TaggedIssue]):
+    dispatcher: IdTaggedFramePerGroupDispatcher = IdTaggedFramePerGroupDispatcher(
+        target='tests/output', opts=DispatchOptions(skip_text=False)
+    )
+    token2id: defaultdict = defaultdict()
+    token2id.default_factory = token2id.__len__
+
+    for tagged_issue in tagged_issues:
+        tagged_frame: pd.DataFrame = widen_tagged_frame(TaggedFramePerGroupDispatcher.process(dispatcher, tagged_issue))
+        encoded_frame: pd.DataFrame = dispatcher.process(tagged_issue)
+
+        assert encoded_frame.token_id.tolist() == tagged_frame.token.apply(lambda t: token2id[t]).tolist()
+        assert encoded_frame.lemma_id.tolist() == tagged_frame.lemma.apply(lambda t: token2id[t]).tolist()
+        assert encoded_frame.pos_id.tolist() == tagged_frame.pos.apply(dispatcher.pos_schema.pos_to_id.get).tolist()
+        assert encoded_frame.pos_id.dtype == np.int8
+
+    assert list(dispatcher.token2id.items()) == list(token2id.items())
+
+
+def process_by_masks(dispatcher: TaggedFramePerGroupDispatcher, item: TaggedIssue) -> pd.DataFrame:
+    """Previous implementation of TaggedFramePerGroupDispatcher.process (column-wise copies and masks)"""
+    pads: set = {'MID', 'MAD', 'PAD'}
+    opts: DispatchOptions = dispatcher.opts
+
+    tagged_frame: pd.DataFrame = item.tagged_frame.copy()
+    tagged_frame['document_id'] += dispatcher.document_id
+
+    if opts.to_lower:
+        tagged_frame["token"] = tagged_frame["token"].str.lower()
+        tagged_frame["lemma"] = tagged_frame["lemma"].str.lower()
+
+    drop_columns: list[str] = ['xpos'] if 'xpos' in tagged_frame.columns else []
+
+    if opts.skip_stopwords:
+        tagged_frame = tagged_frame[~tagged_frame["token"].str.lower().isin(STOPWORDS)]
+    if opts.skip_puncts:
+        tagged_frame = tagged_frame[~tagged_frame["pos"].isin(pads)]
+
+    if opts.skip_text:
+        drop_columns.append('token')
+
+    if opts.skip_lemma:
+        drop_columns.append('lemma')
+    elif opts.to_lower:
+        tagged_frame['lemma'] = tagged_frame['lemma'].str.lower().fillna('')
+
+    return tagged_frame.drop(columns=drop_columns).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('to_lower', [True, False])
+@pytest.mark.parametrize('skip_text,skip_lemma', [(True, False), (False, False), (False, True)])
+@pytest.mark.parametrize('skip_stopwords,skip_puncts', [(True, True), (True, False), (False, True), (False, False)])
+def test_process_equals_previous_implementation(
+    tagged_issues: list[TaggedIssue],
+    to_lower: bool,
+    skip_text: bool,
+    skip_lemma: bool,
+    skip_stopwords: bool,
+    skip_puncts: bool,
+):
+    opts: DispatchOptions = DispatchOptions(
+        to_lower=to_lower,
+        skip_text=skip_text,
+        skip_lemma=skip_lemma,
+        skip_stopwords=skip_stopwords,
+        skip_puncts=skip_puncts,
+    )
+    dispatcher: TaggedFramePerGroupDispatcher = TaggedFramePerGroupDispatcher(target='tests/output', opts=opts)
+    dispatcher.document_id = 7
+
+    for tagged_issue in tagged_issues:
+        tagged_issue.tagged_frame['xpos'] = tagged_issue.tagged_frame['pos']
+        tagged_issue.tagged_frame.loc[tagged_issue.tagged_frame.index[:3], 'lemma'] = np.nan
+        expected: pd.DataFrame = process_by_masks(dispatcher, tagged_issue)
+        pd.testing.assert_frame_equal(widen_tagged_frame(dispatcher.process(tagged_issue)), expected)
+        assert 'xpos' in tagged_issue.tagged_frame.columns
+
+
+@pytest.mark.parametrize(
+    'compress_type,feather_compression',
+    [('feather', None), ('feather', 'zstd'), ('csv', None), ('gzip', None), ('zstd', None), ('lz4', None)],
+)
+@pytest.mark.parametrize('dispatch_cls', [TaggedFramePerGroupDispatcher, IdTaggedFramePerGroupDispatcher])
+def test_dispatched_frame_is_stored_compact_and_read_wide(
+    tagged_issues: list[TaggedIssue], compress_type: str, feather_compression: str, dispatch_cls: type
+):
+    target_folder: str = f'tests/output/{str(uuid.uuid4())[:8]}'
+    opts: DispatchOptions = DispatchOptions(
+        compress_type=compress_type, skip_text=False, compress_level=3, feather_compression=feather_compression
+    )
+    tagged_issue: TaggedIssue = tagged_issues[0]
+
+    with dispatch_cls(target=target_folder, opts=opts) as dispatcher:
+        tagged_frame: pd.DataFrame = dispatcher.process(tagged_issue)
+        dispatcher.dispatch(tagged_issue=tagged_issue)
+
+    narrow_types: dict[str, type] = {'document_id': np.int32, 'token_id': np.int32, 'lemma_id': np.int32}
+    narrow_types |= {'pos_id': np.int8} | {column: 'category' for column in ['token', 'lemma', 'pos']}
+    assert all(tagged_frame[column].dtype == narrow_types[column] for column in tagged_frame.columns)
+
+    filename: str = join(target_folder, tagged_issue.filename)
+    filename = {
+        'feather': replace_extension(filename, 'feather'),
+        'gzip': f"{filename}.gz",
+        'zstd': f"{filename}.zst",
+        'lz4': f"{filename}.lz4",
+    }.get(compress_type, filename)
+    stored_frame: pd.DataFrame = read_tagged_frame(filename)
+
+    pd.testing.assert_frame_equal(stored_frame, widen_tagged_frame(tagged_frame.copy()))
+
+
+def test_document_index_is_streamed_to_disk_and_compacted_at_close(tagged_issues: list[TaggedIssue]):
+    target_folder: str = f'tests/output/{str(uuid.uuid4())[:8]}'
+    stream_filename: str = join(target_folder, DOCUMENT_INDEX_STREAM.format(0))
+
+    with TaggedFramePerGroupDispatcher(target=target_folder, opts=DispatchOptions(compress_type='csv')) as dispatcher:
+        for tagged_issue in tagged_issues:
+            dispatcher.dispatch(tagged_issue=tagged_issue)
+            assert isfile(stream_filename)
+
+    expected: pd.DataFrame = pd.concat([x.document_index for x in tagged_issues]).reset_index(drop=True)
+    expected = expected.astype({'document_id': np.int16, 'year': np.int16, 'n_tokens': np.int16})
+    document_index: pd.DataFrame = pd.read_csv(join(target_folder, 'document_index.csv'), sep='\t', index_col=0)
+
+    assert not isfile(stream_filename)
+    pd.testing.assert_frame_equal(document_index, expected, check_dtype=False)
+    assert dispatcher.document_id == len(expected)
+
+
+def test_document_index_stream_tolerates_changing_columns(tagged_issues: list[TaggedIssue]):
+    target_folder: str = f'tests/output/{str(uuid.uuid4())[:8]}'
+    issues: list[TaggedIssue] = tagged_issues[:2]
+    issues[0].document_index['comment'] = np.nan
+    issues[1].document_index['comment'] = 'a comment'
+    issues[1].document_index['extra'] = 1
+
+    with TaggedFramePerGroupDispatcher(target=target_folder, opts=DispatchOptions(compress_type='csv')) as dispatcher:
+        for tagged_issue in issues:
+            dispatcher.dispatch(tagged_issue=tagged_issue)
+        assert dispatcher.n_index_streams == 2
+
+    expected: pd.DataFrame = pd.concat([x.document_index for x in issues]).reset_index(drop=True)
+    document_index: pd.DataFrame = pd.read_csv(join(target_folder, 'document_index.csv'), sep='\t', index_col=0)
+
+    assert not isfile(join(target_folder, DOCUMENT_INDEX_STREAM.format(0)))
+    assert document_index.comment.tolist()[: len(issues[0].document_index)] == [np.nan] * len(issues[0].document_index)
+    assert set(document_index.comment.dropna()) == {'a comment'}
+    assert document_index.extra.isna().sum() == len(issues[0].document_index)
+    pd.testing.assert_frame_equal(document_index[['document_id', 'title']], expected[['document_id', 'title']])
+    assert dispatcher.document_id == len(expected)
+
+
+def test_id_dispatcher_stores_term_and_document_frequencies(tagged_issues: list[TaggedIssue]):
+    target_folder: str = f'tests/output/{str(uuid.uuid4())[:8]}'
+    opts: DispatchOptions = DispatchOptions(compress_type='csv', skip_text=False)
+    tagged_frames: list[pd.DataFrame] = []
+
+    with IdTaggedFramePerGroupDispatcher(target=target_folder, opts=opts) as dispatcher:
+        for tagged_issue in tagged_issues:
+            tagged_frames.append(dispatcher.process(tagged_issue))
+            dispatcher.dispatch_index_item(tagged_issue)
+
+    tagged_frame: pd.DataFrame = pd.concat(tagged_frames)
+    frequencies: pd.DataFrame = pd.read_csv(join(target_folder, 'term_frequencies.csv'), sep='\t', index_col=0)
+
+    assert frequencies.token_id.tolist() == list(range(len(dispatcher.token2id)))
+    for name in ['token', 'lemma']:
+        ids: pd.Series = tagged_frame[f'{name}_id']
+        expected_tf: pd.Series = ids.value_counts().reindex(frequencies.token_id, fill_value=0)
+        expected_df: pd.Series = (
+            tagged_frame.groupby(ids).document_id.nunique().reindex(frequencies.token_id, fill_value=0)
+        )
+        assert frequencies[f'{name}_tf'].tolist() == expected_tf.tolist()
+        assert frequencies[f'{name}_df'].tolist() == expected_df.tolist()
+
+
+class InterruptingTagger(SimpleTagger):
+    """Simulates a killed run by raising KeyboardInterrupt after `n_calls` calls to `tag`"""
+
+    def __init__(self, n_calls: int):
+        super().__init__(preprocessors=[pretokenize])
+        self.n_calls: int = n_calls
+
+    def _tag(self, text: list[str]) -> list[TaggedData]:
+        if self.n_calls == 0:
+            raise KeyboardInterrupt()
+        self.n_calls -= 1
+        return super()._tag(text)
+
+
+@pytest.mark.parametrize('compress_type', ['csv', 'feather'])
+@pytest.mark.parametrize('damage', [None, 'lost_output', 'partial_record'])
+def test_resumed_run_equals_uninterrupted_run(compress_type: str, damage: str):
+    opts: DispatchOptions = DispatchOptions(compress_type=compress_type, skip_text=False, checkpoint=True)
+    expected: str = tag_sample_corpus(dispatch_opts=opts)
+
+    target: str = f'tests/output/{str(uuid.uuid4())[:8]}'
+    with pytest.raises(KeyboardInterrupt):
+        tag_sample_corpus(target=target, tagger=InterruptingTagger(n_calls=4), dispatch_opts=opts)
+
+    if damage == 'lost_output':
+        os.remove(os.path.join(target, [x for x in os.listdir(target) if x.startswith('BLM-1901')][0]))
+    elif damage == 'partial_record':
+        with open(os.path.join(target, CHECKPOINT_FILENAME), 'ab') as fp:
+            fp.write(b'\x80\x05\x95')
+
+    tagger: FailingTagger = FailingTagger()
+    tag_sample_corpus(
+        target=target,
+        tagger=tagger,
+        dispatch_opts=DispatchOptions(compress_type=compress_type, skip_text=False, resume=True),
+    )
+
+    assert len(tagger.batch_sizes) == (5 if damage == 'lost_output' else 2)
+    assert_same_output(expected, target)
+
+
+def test_checkpoint_journal_is_removed_when_run_completes():
+    opts: DispatchOptions = DispatchOptions(compress_type='csv', checkpoint=True)
+    assert not os.path.isfile(os.path.join(tag_sample_corpus(dispatch_opts=opts), CHECKPOINT_FILENAME))
+
+    raw_store: str = tag_sample_corpus(dispatch_cls=RawTaggedFrameDispatcher, dispatch_opts=opts)
+    assert os.path.isfile(os.path.join(raw_store, CHECKPOINT_FILENAME))
+
+
+@pytest.mark.parametrize('dispatch_cls', [IdTaggedFramePerGroupDispatcher, TaggedFramePerGroupDispatcher])
+@pytest.mark.parametrize('compress_type', ['csv', 'feather'])
+def test_dispatch_raw_store_equals_tag_issues(dispatch_cls: type, compress_type: str):
+    opts: DispatchOptions = DispatchOptions(compress_type=compress_type, skip_text=False)
+    raw_store: str = tag_sample_corpus(
+        dispatch_cls=RawTaggedFrameDispatcher, dispatch_opts=DispatchOptions(checkpoint=True)
+    )
+
+    tagged_issue: TaggedIssue = read_raw_issue(raw_store, raw_store_titles(raw_store)[0])
+    assert 'xpos' in tagged_issue.tagged_frame.columns
+
+    target: str = f'tests/output/{str(uuid.uuid4())[:8]}'
+    dispatch_raw_issues(source=raw_store, target=target, dispatch_cls=dispatch_cls, dispatch_opts=opts)
+
+    assert_same_output(tag_sample_corpus(dispatch_cls=dispatch_cls, dispatch_opts=opts), target)
+
+    tagger: FailingTagger = FailingTagger()
+    tag_sample_corpus(
+        target=raw_store,
+        tagger=tagger,
+        dispatch_cls=RawTaggedFrameDispatcher,
+        dispatch_opts=DispatchOptions(checkpoint=True, resume=True),
+    )
+    assert tagger.batch_sizes == []
+    assert len(raw_store_titles(raw_store)) == 6
+
+
+@pytest.mark.parametrize('numeric_frame', [True, False])
+@pytest.mark.parametrize('row_group_size', [None, 1000])
+def test_partitioned_dataset_equals_frame_per_issue(numeric_frame: bool, row_group_size: int):
+    folder: str = tag_sample_corpus(
+        dispatch_cls=get_dispatcher_class(numeric_frame), dispatch_opts=DispatchOptions(skip_text=False)
+    )
+    dataset_folder: str = tag_sample_corpus(
+        dispatch_cls=get_dispatcher_class(numeric_frame, 'parquet'),
+        dispatch_opts=DispatchOptions(compress_type='parquet', skip_text=False, row_group_size=row_group_size),
+    )
+
+    document_index: pd.DataFrame = pd.read_feather(os.path.join(folder, 'document_index.feather'))
+    pd.testing.assert_frame_equal(
+        pd.read_parquet(os.path.join(dataset_folder, 'document_index.parquet')), document_index
+    )
+
+    expected: pd.DataFrame = pd.concat(
+        [
+            read_tagged_frame(
+                os.path.join(folder, replace_extension(TaggedIssue(title, None, None).filename, 'feather'))
+            )
+            for title in document_index.title.unique()
+        ]
+    ).reset_index(drop=True)
+    tagged_frame: pd.DataFrame = read_tagged_dataset(dataset_folder, columns=list(expected.columns))
+    tagged_frame = tagged_frame.sort_values('document_id', kind='stable').reset_index(drop=True)
+    pd.testing.assert_frame_equal(tagged_frame, expected)
+
+    filenames: list[str] = glob.glob(os.path.join(dataset_folder, DATASET_FOLDER, 'year=*', '*.parquet'))
+    n_row_groups: int = sum(pq.ParquetFile(filename).num_row_groups for filename in filenames)
+    assert len(filenames) == document_index.groupby('title').year.first().nunique()
+    if row_group_size is None:
+        assert n_row_groups == document_index.title.nunique()
+    else:
+        assert len(filenames) <= n_row_groups < document_index.title.nunique()
+
+    subset: pd.DataFrame = read_tagged_dataset(dataset_folder, years=(1943, 1943), document_ids=(0, 3))
+    assert set(subset.year) == {1943} and subset.document_id.between(0, 3).all() and len(subset) > 0
+
+
+@pytest.mark.parametrize('zip_compression', ['zip', 'lzma', 'csv'])
+def test_zip_archive_equals_frame_per_issue(zip_compression: str):
+    folder: str = tag_sample_corpus()
+    archive_folder: str = tag_sample_corpus(
+        dispatch_cls=get_dispatcher_class(True, 'zip'),
+        dispatch_opts=DispatchOptions(compress_type='zip', skip_text=False, zip_compression=zip_compression),
+    )
+
+    assert os.listdir(archive_folder) == [ARCHIVE_FILENAME]
+
+    with zipfile.ZipFile(os.path.join(archive_folder, ARCHIVE_FILENAME)) as archive:
+        assert sorted(archive.namelist()) == sorted(os.listdir(folder))
+        assert {x.compress_type for x in archive.infolist()} == {CompressType(zip_compression).to_zipfile_compression()}
+        for member in archive.namelist():
+            with open(os.path.join(folder, member), 'rb') as fp:
+                assert archive.read(member) == fp.read(), member
+
+    with TaggedArchive(archive_folder) as archive:
+        assert len(archive.members) == len(archive.document_index.title.unique())
+        title: str = archive.document_index.title.iloc[-1]
+        pd.testing.assert_frame_equal(
+            archive.tagged_frame(title),
+            read_tagged_frame(os.path.join(folder, TaggedIssue(title, None, None).filename)),
+        )
+
+
+@pytest.mark.parametrize('write_threads', [1, 3])
+@pytest.mark.parametrize('dispatch_cls', [IdTaggedFramePerGroupDispatcher, TaggedFramePerGroupDispatcher])
+@pytest.mark.parametrize('compress_type', ['csv', 'feather'])
+def test_background_writes_equal_synchronous_writes(write_threads: int, dispatch_cls: type, compress_type: str):
+    opts: DispatchOptions = DispatchOptions(compress_type=compress_type, skip_text=False, checkpoint=True)
+    expected: str = tag_sample_corpus(dispatch_cls=dispatch_cls, dispatch_opts=opts)
+
+    opts = DispatchOptions(
+        compress_type=compress_type, skip_text=False, checkpoint=True, write_threads=write_threads, write_queue_size=2
+    )
+    assert_same_output(expected, tag_sample_corpus(dispatch_cls=dispatch_cls, dispatch_opts=opts))
+
+
+class FailingStoreDispatcher(IdTaggedFramePerGroupDispatcher):
+    """Fails to store the tagged frame of issue `fail_on`. Waits for each issue to be written before next dispatch."""
+
+    fail_on: str = 'BLM-1902'
+
+    def store(self, filename: str, data: str | pd.DataFrame) -> str:
+        if os.path.basename(filename).startswith(self.fail_on):
+            raise OSError("disk full")
+        return super().store(filename, data)
+
+    def write_issue(self, tagged_issue: TaggedIssue, items: list, store=None) -> None:
+        super().write_issue(tagged_issue, items, store)
+        self.writer.tasks.join()
+
+
+def test_background_write_error_is_raised_and_not_checkpointed():
+    target: str = f'tests/output/{str(uuid.uuid4())[:8]}'
+    opts: DispatchOptions = DispatchOptions(compress_type='csv', checkpoint=True, write_threads=2)
+
+    tagger: FailingTagger = FailingTagger()
+    with pytest.raises(OSError, match="disk full"):
+        tag_sample_corpus(target=target, tagger=tagger, dispatch_cls=FailingStoreDispatcher, dispatch_opts=opts)
+
+    assert len(tagger.batch_sizes) == 4
+
+    titles: list[str] = [
+        record['title'] for record in CheckpointJournal(os.path.join(target, CHECKPOINT_FILENAME)).read()
+    ]
+    assert titles == [x[0] for x in create_issues(6)][: len(titles)]
+    assert not [x for x in titles if x.startswith(FailingStoreDispatcher.fail_on)]
+
+
+@pytest.mark.parametrize('dispatch_cls', [IdTaggedFramePerGroupDispatcher, TaggedFramePerGroupDispatcher])
+@pytest.mark.parametrize('compress_type', ['csv', 'feather', 'zstd'])
+def test_merged_shards_equal_sequential_run(dispatch_cls: type, compress_type: str):
+    opts: DispatchOptions = DispatchOptions(compress_type=compress_type, skip_text=False)
+    issues: list[tuple[str, pd.DataFrame]] = create_issues(6)
+    expected: str = tag_sample_corpus(dispatch_cls=dispatch_cls, dispatch_opts=opts)
+
+    shards: list[str] = [
+        tag_sample_corpus(source=pd.concat([x[1] for x in issues[i:j]]), dispatch_cls=dispatch_cls, dispatch_opts=opts)
+        for i, j in [(0, 2), (2, 3), (3, 6)]
+    ]
+    if dispatch_cls is IdTaggedFramePerGroupDispatcher:
+        assert len({len(read_stored(shard, "token2id")) for shard in shards}) > 1
+
+    target: str = f'tests/output/{str(uuid.uuid4())[:8]}'
+    merge_shards(shards, target, opts=DispatchOptions(compress_type=compress_type, write_threads=2))
+
+    assert_same_output(expected, target)
+
+
+@pytest.mark.parametrize('compress_type', ['parquet', 'zip'])
+def test_merge_shards_into_single_file_output_is_refused(compress_type: str):
+    target: str = f'tests/output/{str(uuid.uuid4())[:8]}'
+    with pytest.raises(ValueError, match="not supported"):
+        merge_shards([tag_sample_corpus()], target, opts=DispatchOptions(compress_type=compress_type))
+    assert not os.path.exists(target)
+
+
+def test_raw_store_is_only_reused_if_tagged_with_same_settings():
+    raw_store: str = f'tests/output/{str(uuid.uuid4())[:8]}'
+    settings: dict = dict(tagger={'tagger': 'a'}, source=dict(filename='a.csv', size=1), years=(1900, 1950))
+    titles_filename: str = os.path.join(raw_store, RAW_TITLES_FILENAME)
+
+    prepare_raw_store(raw_store, settings, force=False)
+    with open(titles_filename, 'w', encoding='utf-8') as fp:
+        fp.write("BLM-1900:1\n")
+
+    prepare_raw_store(raw_store, dict(settings), force=False)
+    assert os.path.isfile(titles_filename)
+
+    other_settings: dict = settings | {'tagger': {'tagger': 'b'}}
+    with pytest.raises(WorkFlowError):
+        prepare_raw_store(raw_store, other_settings, force=False)
+
+    prepare_raw_store(raw_store, other_settings, force=True)
+    assert not os.path.isfile(titles_filename)
+
+    os.remove(os.path.join(raw_store, RAW_STORE_FILENAME))
+    with open(titles_filename, 'w', encoding='utf-8') as fp:
+        fp.write("BLM-1900:1\n")
+    with pytest.raises(WorkFlowError):
+        prepare_raw_store(raw_store, other_settings, force=False)
@@ -1,6 +1,18 @@
+import os
+import uuid
+
 import pandas as pd
+import pyarrow as pa
+import pytest
 
-from pybolima.load import issue_reader, load_bolima
+from pybolima.load import (
+    cache_source,
+    issue_reader,
+    load_bolima,
+    load_bolima_chunks,
+    partition_issues,
+    stream_issues,
+)
 
 from . import DATA_FILENAME, SAMPLE_CORPUS_FILENAME
 
@@ -39,3 +51,141 @@ def test_issue_reader():
     assert len(data) == 2
 
     assert EXPECTED_COLUMNS.intersection(data.columns) == EXPECTED_COLUMNS
+
+
+def test_partition_issues_equals_per_title_masks():
+    corpus: pd.DataFrame = load_bolima(SAMPLE_CORPUS_FILENAME)
+    corpus = pd.concat([corpus, corpus.assign(title='BLM-1932:4'), corpus.iloc[:1].assign(title='BLM-1901:1')])
+    corpus = corpus.reset_index(drop=True)
+
+    issues = list(partition_issues(corpus))
+
+    assert [title for title, _ in issues] == sorted(corpus['title'].unique())
+    for title, pages in issues:
+        expected: pd.DataFrame = corpus[corpus['title'] == title].drop(columns=['Unnamed: 0'], errors='ignore')
+        assert 'Unnamed: 0' not in pages.columns
+        pd.testing.assert_frame_equal(pages, expected)
+
+
+@pytest.mark.parametrize('extension', ['csv', 'feather', 'parquet'])
+def test_stream_issues_carries_issues_across_chunks(extension: str):
+    corpus: pd.DataFrame = pd.read_csv(SAMPLE_CORPUS_FILENAME, sep='\t', index_col=0)[['title', 'page', 'text']]
+    corpus = pd.concat([corpus] * 3).reset_index(drop=True)
+    corpus['title'] = [f"BLM-19{40 + i // 5}:1" for i in range(len(corpus))]
+
+    filename: str = f'tests/output/{str(uuid.uuid4())[:8]}.{extension}'
+    if extension == 'csv':
+        corpus.to_csv(filename, sep='\t', index=False)
+    elif extension == 'feather':
+        corpus.to_feather(filename, chunksize=3)
+    else:
+        corpus.to_parquet(filename, row_group_size=3)
+
+    expected = list(partition_issues(load_bolima(filename)))
+    streamed = list(issue_reader(filename, chunksize=3))
+
+    assert [title for title, _ in streamed] == [title for title, _ in expected]
+    for (_, pages), (_, expected_pages) in zip(streamed, expected):
+        pd.testing.assert_frame_equal(pages, expected_pages)
+
+
+def test_stream_issues_rejects_ungrouped_source():
+    corpus: pd.DataFrame = load_bolima(SAMPLE_CORPUS_FILENAME)
+    chunks = [corpus.iloc[[0]], corpus.iloc[[2]], corpus.iloc[[1]]]
+    with pytest.raises(ValueError):
+        list(stream_issues(chunks))
+
+
+def test_load_bolima_chunks_keeps_document_id():
+    expected: pd.DataFrame = load_bolima(SAMPLE_CORPUS_FILENAME)
+    chunks: list[pd.DataFrame] = list(load_bolima_chunks(SAMPLE_CORPUS_FILENAME, chunksize=3))
+    assert [len(x) for x in chunks] == [3, 1]
+    assert pd.concat(chunks)['document_id'].tolist() == expected['document_id'].tolist()
+
+
+@pytest.mark.parametrize('extension', ['feather', 'parquet'])
+def test_load_columnar_pushes_down_filters(extension: str):
+    corpus: pd.DataFrame = pd.read_csv(SAMPLE_CORPUS_FILENAME, sep='\t', index_col=0)
+    corpus['dark_id'] = 'x'
+    filename: str = f'tests/output/{str(uuid.uuid4())[:8]}.{extension}'
+    getattr(corpus.reset_index(drop=True), f'to_{extension}')(filename)
+
+    data: pd.DataFrame = load_bolima(filename, years=(1950, 1960))
+    assert set(data.title) == {'BLM-1953:1'}
+    assert 'dark_id' not in data.columns
+    assert EXPECTED_COLUMNS.intersection(data.columns) == EXPECTED_COLUMNS
+    assert data.document_id.tolist() == corpus[corpus.year == 1953].document_id.tolist()
+
+    data = load_bolima(filename, titles=['BLM-1943:1'], years=(1900, 2000))
+    assert set(data.title) == {'BLM-1943:1'}
+
+    issues = list(issue_reader(filename, chunksize=1, years=(1940, 1945)))
+    assert [title for title, _ in issues] == ['BLM-1943:1']
+
+
+def test_load_columnar_derives_year_filter_from_title():
+    corpus: pd.DataFrame = pd.read_csv(SAMPLE_CORPUS_FILENAME, sep='\t', index_col=0)[['title', 'page', 'text']]
+    filename: str = f'tests/output/{str(uuid.uuid4())[:8]}.parquet'
+    corpus.reset_index(drop=True).to_parquet(filename)
+
+    data: pd.DataFrame = load_bolima(filename, years=(1953, 1953))
+    assert set(data.title) == {'BLM-1953:1'}
+    assert set(data.year) == {1953}
+
+
+def test_issue_reader_filters_csv_and_frame():
+    issues = list(issue_reader(SAMPLE_CORPUS_FILENAME, titles=['BLM-1953:1']))
+    assert [title for title, _ in issues] == ['BLM-1953:1']
+
+    issues = list(issue_reader(load_bolima(SAMPLE_CORPUS_FILENAME), years=(1943, 1943)))
+    assert [title for title, _ in issues] == ['BLM-1943:1']
+
+
+def test_load_bolima_caches_csv_source():
+    cache_folder: str = f'tests/output/{str(uuid.uuid4())[:8]}'
+    expected: pd.DataFrame = load_bolima(SAMPLE_CORPUS_FILENAME)
+
+    cache_filename: str = cache_source(SAMPLE_CORPUS_FILENAME, cache_folder)
+    assert os.path.isfile(cache_filename)
+    assert cache_source(SAMPLE_CORPUS_FILENAME, cache_folder) == cache_filename
+
+    data: pd.DataFrame = load_bolima(SAMPLE_CORPUS_FILENAME, cache_folder=cache_folder)
+    assert os.listdir(cache_folder) == [os.path.basename(cache_filename)]
+    assert data.columns.tolist() == [c for c in expected.columns if c != 'Unnamed: 0']
+    pd.testing.assert_frame_equal(data, expected.drop(columns=['Unnamed: 0']))
+
+    data = load_bolima(SAMPLE_CORPUS_FILENAME, cache_folder=cache_folder, years=(1953, 1953))
+    assert set(data.title) == {'BLM-1953:1'}
+
+
+def test_load_bolima_reads_missing_texts_as_nan_when_cached():
+    cache_folder: str = f'tests/output/{str(uuid.uuid4())[:8]}'
+    filename: str = f'{cache_folder}.csv'
+    source: pd.DataFrame = load_bolima(SAMPLE_CORPUS_FILENAME).drop(columns=['Unnamed: 0']).head(3)
+    with open(filename, 'w', encoding='utf-8') as fp:
+        fp.write(source.assign(text=['NA', '', 'hej']).to_csv(sep='\t', index=False, na_rep='NA'))
+
+    expected: pd.DataFrame = load_bolima(filename)
+    assert expected.text.isna().tolist() == [True, True, False]
+
+    pd.testing.assert_frame_equal(load_bolima(filename, cache_folder=cache_folder), expected)
+
+
+def test_load_bolima_memory_maps_feather_source():
+    filename: str = f'tests/output/{str(uuid.uuid4())[:8]}.feather'
+    expected: pd.DataFrame = load_bolima(SAMPLE_CORPUS_FILENAME).drop(columns=['Unnamed: 0'])
+    expected.to_feather(filename, compression='uncompressed')
+
+    allocated: int = pa.total_allocated_bytes()
+    data: pd.DataFrame = load_bolima(filename, memory_map=True)
+
+    assert pa.total_allocated_bytes() - allocated < expected.text.str.len().sum()
+    assert str(data.text.dtype) == 'string'
+    assert data.columns.tolist() == expected.columns.tolist()
+
+    issues = list(issue_reader(filename, memory_map=True))
+    assert [title for title, _ in issues] == ['BLM-1943:1', 'BLM-1953:1']
+    assert issues[1][1].text.to_list() == expected[expected.title == 'BLM-1953:1'].text.to_list()
+
+    chunks = list(load_bolima_chunks(filename, chunksize=3, memory_map=True))
+    assert pd.concat(chunks).text.to_list() == expected.text.to_list()
@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pytest
+
+from pybolima.pipeline import TaskQueue, prefetch
+
+
+def test_prefetch_yields_items_in_order():
+    assert list(prefetch(range(100), maxsize=3)) == list(range(100))
+
+
+def test_prefetch_propagates_error():
+    def items():
+        yield 1
+        raise ValueError("source failed")
+
+    with pytest.raises(ValueError, match="source failed"):
+        list(prefetch(items(), maxsize=2))
+
+
+def test_prefetch_applies_backpressure_and_stops_early():
+    produced: list[int] = []
+
+    def items():
+        for i in range(1000):
+            produced.append(i)
+            yield i
+
+    iterator = prefetch(items(), maxsize=2)
+    assert next(iterator) == 0
+    time.sleep(0.2)
+    assert len(produced) <= 4
+
+    iterator.close()
+    assert len(produced) <= 5
+
+
+def test_task_queue_runs_tasks_in_order():
+    results: list[int] = []
+    with TaskQueue(maxsize=2, workers=1) as tasks:
+        for i in range(50):
+            tasks.submit(results.append, i)
+    assert results == list(range(50))
+    assert tasks.stats.n_tasks == 50
+    assert tasks.stats.max_depth <= 2
+
+
+def test_task_queue_surfaces_error_at_next_submit():
+    def fail():
+        raise ValueError("write failed")
+
+    tasks: TaskQueue = TaskQueue(maxsize=2, workers=2)
+    tasks.submit(fail)
+    time.sleep(0.1)
+    with pytest.raises(ValueError, match="write failed"):
+        tasks.submit(lambda: None)
+    with pytest.raises(ValueError, match="write failed"):
+        tasks.close()
+
+
+def test_task_queue_surfaces_error_at_close():
+    def fail():
+        raise ValueError("write failed")
+
+    with pytest.raises(ValueError, match="write failed"):
+        with TaskQueue(maxsize=2, workers=1) as tasks:
+            tasks.submit(fail)
+
+
+def test_task_queue_uses_several_threads():
+    barrier: threading.Barrier = threading.Barrier(3, timeout=5)
+    with TaskQueue(maxsize=3, workers=3) as tasks:
+        for _ in range(3):
+            tasks.submit(barrier.wait)
+    assert tasks.stats.n_tasks == 3
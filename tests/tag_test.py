@@ -1,22 +1,28 @@
+import itertools
 import os
+import uuid
+from functools import partial
 from typing import Iterable
 
 import pandas as pd
 import pytest
 from pytest import fixture
 
-from pybolima.dispatch import TaggedIssue
+import stanza
+from pybolima.dispatch import DispatchOptions, IdTaggedFramePerGroupDispatcher, TaggedIssue
 from pybolima.load import issue_reader, load_bolima
-from pybolima.stanza import ITagger, StanzaTagger
-from pybolima.tagger import tag_issue
+from pybolima.stanza import ITagger, StanzaTagger, TaggedData, length_sorted_batches
+from pybolima.tagger import tag_issue, tag_issue_batches, tag_issues, to_tagged_frame
 from pybolima.utility import pretokenize
 
 from . import DATA_FILENAME, MODEL_ROOT, SAMPLE_CORPUS_FILENAME, TEST_DOCUMENTS
+from .conftest import SimpleTagger
 
 # pylint: disable=redefined-outer-name
 
-if not os.path.isdir(MODEL_ROOT):
-    pytest.skip(f"Skipping Stanza tests since model path {MODEL_ROOT} doesn't exist.", allow_module_level=True)
+requires_models = pytest.mark.skipif(
+    not os.path.isdir(MODEL_ROOT), reason=f"Skipping Stanza tests since model path {MODEL_ROOT} doesn't exist."
+)
 
 
 @fixture(scope="session")
@@ -54,12 +60,14 @@ def create_sample_tagged_issues(tagger: ITagger) -> list[TaggedIssue]:
     return data
 
 
+@requires_models
 @pytest.mark.skip(reason="Infrastructure test")
 def test_store_bolima_sample_corpus():
     corpus: list[pd.DataFrame] = create_sample_corpus(TEST_DOCUMENTS, [15, 20])
     corpus.to_csv(SAMPLE_CORPUS_FILENAME, sep='\t')
 
 
+@requires_models
 @pytest.mark.skip(reason="Infrastructure test")
 def test_store_tagged_issue_sample_data(tagger: ITagger):
     tagged_issues: list[TaggedIssue] = create_sample_tagged_issues(tagger)
@@ -68,6 +76,7 @@ def test_store_tagged_issue_sample_data(tagger: ITagger):
         tagged_issue.document_index.to_csv(f'tests/test_data/{tagged_issue.title}_document_index.csv', '\t')
 
 
+@requires_models
 def test_create_tagger(tagger: ITagger):
     texts: list[str] = [
         "hans lätt och som gol om glädje poetiska",
@@ -79,6 +88,7 @@ def test_create_tagger(tagger: ITagger):
     assert data
 
 
+@requires_models
 def test_tag_bolima(tagger: ITagger):
     corpus: pd.DataFrame = load_sample_corpus()
     for title in TEST_DOCUMENTS:
@@ -89,6 +99,7 @@ def test_tag_bolima(tagger: ITagger):
         assert set(tagged_issue.tagged_frame.columns) == {"token", "lemma", "pos", "document_id"}
 
 
+@requires_models
 def test_tagged_issue():
     assert set(TaggedIssue.find('tests/test_data')) == set(TEST_DOCUMENTS)
     assert {x.title for x in TaggedIssue.load_all('tests/test_data')} == set(TEST_DOCUMENTS)
@@ -110,6 +121,7 @@ def test_tagged_issue():
     assert set(tagged_issue.document_index.document_name) == {'BLM-1943:1_15', 'BLM-1943:1_20'}
 
 
+@requires_models
 def test_issue_reader():
     reader: Iterable[tuple[str, pd.DataFrame]] = issue_reader(source=load_sample_corpus())
 
@@ -119,6 +131,246 @@ def test_issue_reader():
     assert [x[0] for x in data] == sorted(TEST_DOCUMENTS)
 
 
+def stanza_word(i: int, text: str, lemma: str, upos: str, xpos: str) -> dict:
+    return {'id': i, 'text': text, 'lemma': lemma, 'upos': upos, 'xpos': xpos}
+
+
+def test_stanza_tagger_joins_sentences_of_segmented_page():
+    sentences: list[list[dict]] = [
+        [
+            stanza_word(1, 'Hunden', 'hund', 'NOUN', 'NN'),
+            stanza_word(2, 'skäller', 'skälla', 'VERB', 'VB'),
+            stanza_word(3, '.', '.', 'PUNCT', 'MAD'),
+        ],
+        [stanza_word(1, 'Katten', None, 'NOUN', 'NN'), stanza_word(2, 'sover', 'sova', 'VERB', 'VB')],
+    ]
+    page: list[dict] = [dict(word, id=i + 1) for i, word in enumerate(itertools.chain(*sentences))]
+
+    segmented: stanza.Document = stanza.Document(sentences, text="Hunden skäller .\nKatten sover")
+    unsegmented: stanza.Document = stanza.Document([page], text="Hunden skäller . Katten sover")
+    assert len(segmented.sentences) == 2
+
+    tagger: StanzaTagger = object.__new__(StanzaTagger)  # _to_dict doesn't use the (model loading) pipeline
+    data: TaggedData = tagger._to_dict(segmented)  # pylint: disable=protected-access
+
+    assert data == tagger._to_dict(unsegmented)  # pylint: disable=protected-access
+    assert data['token'] == ['Hunden', 'skäller', '.', 'Katten', 'sover']
+    assert data['lemma'] == ['hund', 'skälla', '.', 'katten', 'sova']
+    assert data['n_tokens'] == data['n_words'] == 5
+
+
+def to_tagged_data(tagged_issue: TaggedIssue) -> list[TaggedData]:
+    return [
+        dict(token=page.token.tolist(), lemma=page.lemma.tolist(), pos=page.pos.tolist(), xpos=page.pos.tolist())
+        for _, page in tagged_issue.tagged_frame.groupby('document_id')
+    ]
+
+
+def test_to_tagged_frame(tagged_issues: list[TaggedIssue]):
+    for tagged_issue in tagged_issues:
+        tagged_frame: pd.DataFrame = to_tagged_frame(to_tagged_data(tagged_issue))
+        pd.testing.assert_frame_equal(tagged_frame, tagged_issue.tagged_frame)
+
+
+def test_to_tagged_frame_keeps_tokens_as_strings():
+    tagged_frame: pd.DataFrame = to_tagged_frame(
+        [
+            dict(token=['NA', 'null', '1943'], lemma=['NA', 'null', '1943'], pos=['NN', 'NN', 'RG'], xpos=['', '', '']),
+            dict(token=['"', 'a'], lemma=['"', 'a'], pos=['MID', 'DT'], xpos=['', '']),
+        ]
+    )
+    assert tagged_frame.token.tolist() == ['NA', 'null', '1943', '"', 'a']
+    assert tagged_frame.document_id.tolist() == [0, 0, 0, 1, 1]
+    assert tagged_frame.index.tolist() == [0, 1, 2, 0, 1]
+    assert set(tagged_frame.columns) == {"token", "lemma", "pos", "document_id"}
+
+
+def test_tag_issue(simple_tagger: ITagger):
+    for title, pages in issue_reader(SAMPLE_CORPUS_FILENAME):
+        tagged_issue: TaggedIssue = tag_issue(tagger=simple_tagger, title=title, issue_pages=pages)
+        assert tagged_issue.title in TEST_DOCUMENTS
+        assert (
+            tagged_issue.document_index.n_tokens.tolist()
+            == tagged_issue.tagged_frame.groupby('document_id').size().tolist()
+        )
+
+
+class FailingTagger(SimpleTagger):
+    """Counts calls to `tag`, and fails on batches that contains a text with `fail_on`"""
+
+    def __init__(self, fail_on: str = None):
+        super().__init__(preprocessors=[pretokenize])
+        self.fail_on: str = fail_on
+        self.batch_sizes: list[int] = []
+
+    def _tag(self, text: list[str]) -> list[TaggedData]:
+        self.batch_sizes.append(len(text))
+        if self.fail_on and any(self.fail_on in d for d in text):
+            raise ValueError(self.fail_on)
+        return super()._tag(text)
+
+
+def create_issues(n_issues: int) -> list[tuple[str, pd.DataFrame]]:
+    corpus: pd.DataFrame = load_bolima(SAMPLE_CORPUS_FILENAME)
+    issues: list[tuple[str, pd.DataFrame]] = []
+    for i in range(n_issues):
+        pages: pd.DataFrame = corpus.iloc[: 1 + i % 4].assign(title=f"BLM-19{i:02}:1")
+        issues.append((f"BLM-19{i:02}:1", pages))
+    return issues
+
+
+@pytest.mark.parametrize('batch_tokens', [None, 1, 500, 2000, 100000])
+def test_tag_issue_batches_equals_tag_issue(batch_tokens: int):
+    issues: list[tuple[str, pd.DataFrame]] = create_issues(7)
+    tagger: FailingTagger = FailingTagger()
+
+    tagged_issues = list(tag_issue_batches(tagger=tagger, issues=issues, batch_tokens=batch_tokens))
+
+    assert [title for title, _ in tagged_issues] == [title for title, _ in issues]
+    for (title, pages), (_, tagged_issue) in zip(issues, tagged_issues):
+        expected: TaggedIssue = tag_issue(tagger=tagger, title=title, issue_pages=pages)
+        pd.testing.assert_frame_equal(tagged_issue.tagged_frame, expected.tagged_frame)
+        pd.testing.assert_frame_equal(tagged_issue.document_index, expected.document_index)
+
+
+def test_tag_issue_batches_packs_pages_of_consecutive_issues():
+    issues: list[tuple[str, pd.DataFrame]] = create_issues(7)
+    tagger: FailingTagger = FailingTagger()
+
+    list(tag_issue_batches(tagger=tagger, issues=issues, batch_tokens=None))
+    assert len(tagger.batch_sizes) == 7
+
+    tagger.batch_sizes = []
+    list(tag_issue_batches(tagger=tagger, issues=issues, batch_tokens=100000))
+    assert tagger.batch_sizes == [sum(len(pages) for _, pages in issues)]
+
+
+def test_tag_issue_batches_isolates_failing_issue():
+    issues: list[tuple[str, pd.DataFrame]] = create_issues(4)
+    issues[2] = (issues[2][0], issues[2][1].assign(text=lambda x: x.text + " BOOM"))
+
+    tagged_issues = list(tag_issue_batches(tagger=FailingTagger("BOOM"), issues=issues, batch_tokens=100000))
+
+    assert [title for title, _ in tagged_issues] == [title for title, _ in issues]
+    assert [isinstance(x, Exception) for _, x in tagged_issues] == [False, False, True, False]
+
+
+def tag_sample_corpus(**kwargs) -> str:
+    target_folder: str = kwargs.pop('target', None) or f'tests/output/{str(uuid.uuid4())[:8]}'
+    source: str | pd.DataFrame = kwargs.pop('source', None)
+    tag_issues(
+        kwargs.pop('tagger', None) or SimpleTagger(preprocessors=[pretokenize]),
+        source=pd.concat([x[1] for x in create_issues(6)]) if source is None else source,
+        target=target_folder,
+        dispatch_cls=kwargs.pop('dispatch_cls', IdTaggedFramePerGroupDispatcher),
+        dispatch_opts=kwargs.pop('dispatch_opts', None) or DispatchOptions(compress_type='csv', skip_text=False),
+        **kwargs,
+    )
+    return target_folder
+
+
+def assert_same_output(folder: str, other_folder: str) -> None:
+    filenames: list[str] = sorted(os.listdir(folder))
+    assert filenames == sorted(os.listdir(other_folder))
+    for filename in filenames:
+        with open(os.path.join(folder, filename), 'rb') as fp, open(os.path.join(other_folder, filename), 'rb') as gp:
+            assert fp.read() == gp.read(), filename
+
+
+def test_tag_issues_with_batches_equals_sequential():
+    assert_same_output(tag_sample_corpus(), tag_sample_corpus(batch_tokens=1500))
+
+
+def test_length_sorted_batches():
+    lengths: list[int] = [3, 10, 1, 4, 4, 12]
+    assert length_sorted_batches(lengths, token_budget=1000) == [[5, 1, 3, 4, 0, 2]]
+    assert length_sorted_batches(lengths, token_budget=10) == [[5], [1], [3, 4], [0, 2]]
+    assert length_sorted_batches(lengths, token_budget=1) == [[5], [1], [3], [4], [0], [2]]
+
+
+def test_tagger_with_token_budget_restores_order_and_reduces_padding():
+    texts: list[str] = [" ".join(["ord"] * n) + f" {i}" for i, n in enumerate([3, 200, 1, 40, 45, 180, 2])]
+
+    tagger: FailingTagger = FailingTagger()
+    expected: list[TaggedData] = tagger.tag(texts)
+
+    budgeted_tagger: FailingTagger = FailingTagger()
+    budgeted_tagger.token_budget = 400
+
+    assert budgeted_tagger.tag(texts) == expected
+    assert budgeted_tagger.batch_sizes == [1, 2, 4]
+    assert budgeted_tagger.stats.n_tokens == tagger.stats.n_tokens
+    assert budgeted_tagger.stats.padding_ratio < tagger.stats.padding_ratio
+    assert budgeted_tagger.stats.tokens_per_second > 0
+
+
+def test_tagger_with_segments_keeps_tokens_and_counts():
+    corpus: pd.DataFrame = load_bolima(SAMPLE_CORPUS_FILENAME)
+    texts: list[str] = corpus.text.tolist() + [" ".join(["ord"] * 333)]
+
+    expected: list[TaggedData] = SimpleTagger(preprocessors=[pretokenize]).tag(texts)
+    tagger: ITagger = SimpleTagger(preprocessors=[pretokenize], max_segment_length=50)
+
+    assert all(len(line.split()) <= 50 for text in texts for line in tagger.preprocess(text).split('\n'))
+    assert tagger.tag(texts) == expected
+
+
+@pytest.mark.parametrize('batch_tokens', [None, 1500])
+def test_tag_issues_with_workers_equals_sequential(batch_tokens: int):
+    tagger_factory = partial(SimpleTagger, preprocessors=[pretokenize])
+    assert_same_output(
+        tag_sample_corpus(), tag_sample_corpus(tagger=tagger_factory, workers=2, batch_tokens=batch_tokens)
+    )
+
+
+def test_tag_issues_with_workers_requires_tagger_factory():
+    target: str = f'tests/output/{str(uuid.uuid4())[:8]}'
+    with pytest.raises(TypeError, match="tagger factory"):
+        tag_sample_corpus(target=target, tagger=SimpleTagger(preprocessors=[pretokenize]), workers=2)
+    assert not os.path.exists(target)
+
+
+@pytest.mark.parametrize('workers,batch_tokens', [(1, None), (1, 1500), (2, None)])
+def test_tag_issues_with_overlapping_stages_equals_sequential(workers: int, batch_tokens: int):
+    tagger = partial(SimpleTagger, preprocessors=[pretokenize])
+    assert_same_output(
+        tag_sample_corpus(),
+        tag_sample_corpus(tagger=tagger, workers=workers, batch_tokens=batch_tokens, queue_size=2),
+    )
+
+
+class FailingDispatcher(IdTaggedFramePerGroupDispatcher):
+    """Fails to dispatch issue `fail_on`"""
+
+    fail_on: str = 'BLM-1902:1'
+
+    def dispatch(self, tagged_issue: TaggedIssue) -> None:
+        if tagged_issue.title == self.fail_on:
+            raise ValueError("cannot dispatch")
+        super().dispatch(tagged_issue)
+
+
+@pytest.mark.parametrize('queue_size', [0, 2])
+def test_dispatch_error_stops_run(queue_size: int):
+    tagger: FailingTagger = FailingTagger()
+    with pytest.raises(ValueError, match="cannot dispatch"):
+        tag_sample_corpus(tagger=tagger, dispatch_cls=FailingDispatcher, queue_size=queue_size)
+
+    if not queue_size:
+        assert len(tagger.batch_sizes) == 3
+
+
+def test_failed_tagging_is_skipped():
+    issues: list[tuple[str, pd.DataFrame]] = create_issues(6)
+    issues[3] = (issues[3][0], issues[3][1].assign(text=lambda x: x.text + " BOOM"))
+    tagger: FailingTagger = FailingTagger("BOOM")
+    target: str = tag_sample_corpus(tagger=tagger, source=pd.concat([x[1] for x in issues]))
+
+    assert len(tagger.batch_sizes) == 6
+    assert not [x for x in os.listdir(target) if x.startswith('BLM-1903')]
+    assert len([x for x in os.listdir(target) if x.startswith('BLM-')]) == 5
+
+
 # def test_stanza_download():
 #     stanza.download(
 #         lang="en",
@@ -0,0 +1,29 @@
+import uuid
+
+import pyarrow as pa
+import pytest
+
+from pybolima import utility
+from pybolima.utility import segment, store_str
+
+
+@pytest.mark.parametrize('compress_type,level', [('zstd', None), ('zstd', 9), ('lz4', None)])
+@pytest.mark.parametrize('threads', [1, 4])
+def test_store_str_with_arrow_codec(monkeypatch, compress_type: str, level: int, threads: int):
+    monkeypatch.setattr(utility, 'FRAME_SIZE', 1000)
+    text: str = "".join(f"token{i}\tlemma{i % 97}\tNN\n" for i in range(5000))
+
+    filename: str = store_str(
+        f'tests/output/{str(uuid.uuid4())[:8]}.csv', text, compress_type=compress_type, level=level, threads=threads
+    )
+
+    assert filename.endswith(utility.ARROW_CODECS[compress_type])
+    with pa.input_stream(filename, compression=compress_type) as fp:
+        assert fp.read().decode('utf-8') == text
+
+
+def test_segment():
+    assert segment("a b c", max_length=5) == "a b c"
+    assert segment("a b . c d e f ! g", max_length=4) == "a b .\nc d e f\n! g"
+    assert segment("a b c d e f g", max_length=3) == "a b c\nd e f\ng"
+    assert segment("a. b c d e", max_length=3) == "a.\nb c d\ne"
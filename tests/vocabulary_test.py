@@ -0,0 +1,125 @@
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pybolima.dispatch import DispatchOptions, IdTaggedFramePerGroupDispatcher
+from pybolima.vocabulary import Vocabulary
+
+from .tag_test import create_issues, tag_sample_corpus
+
+
+def vocabulary_filename() -> str:
+    os.makedirs('tests/output', exist_ok=True)
+    return f'tests/output/{str(uuid.uuid4())[:8]}_token2id'
+
+
+def test_vocabulary_is_extended_with_stable_ids():
+    filename: str = vocabulary_filename()
+    vocabulary: Vocabulary = Vocabulary(filename)
+    assert [vocabulary[token] for token in ['a', 'räksmörgås', '', 'a', 'b']] == [0, 1, 2, 0, 3]
+    vocabulary.save()
+
+    vocabulary = Vocabulary.load(filename)
+    assert list(vocabulary.token2id.items()) == [('a', 0), ('räksmörgås', 1), ('', 2), ('b', 3)]
+    assert [vocabulary[token] for token in ['c', 'b', 'd']] == [4, 3, 5]
+    vocabulary.save()
+    vocabulary.save()
+
+    assert list(Vocabulary.load(filename).token2id) == ['a', 'räksmörgås', '', 'b', 'c', 'd']
+    assert Vocabulary.load(filename).read_strings().to_pylist() == ['a', 'räksmörgås', '', 'b', 'c', 'd']
+
+
+def test_vocabulary_ignores_partially_saved_tokens():
+    filename: str = vocabulary_filename()
+    vocabulary: Vocabulary = Vocabulary(filename)
+    _ = vocabulary['a'], vocabulary['b']
+    vocabulary.save()
+
+    with open(vocabulary.strings_filename, 'ab') as fp:
+        fp.write(b'xyz')
+    with open(vocabulary.offsets_filename, 'ab') as fp:
+        fp.write(b'\x05\x00')
+
+    vocabulary = Vocabulary.load(filename)
+    assert list(vocabulary.token2id) == ['a', 'b']
+
+    _ = vocabulary['c']
+    vocabulary.save()
+    assert list(Vocabulary.load(filename).token2id) == ['a', 'b', 'c']
+
+
+def test_vocabulary_refuses_to_save_non_string_tokens():
+    filename: str = vocabulary_filename()
+    vocabulary: Vocabulary = Vocabulary(filename)
+    _ = vocabulary['a'], vocabulary[np.nan], vocabulary['nan']
+
+    with pytest.raises(ValueError):
+        vocabulary.save()
+
+    assert len(Vocabulary.load(filename)) == 0
+
+
+def test_dispatcher_encodes_missing_tokens_as_empty_string():
+    filename: str = vocabulary_filename()
+    opts: DispatchOptions = DispatchOptions(compress_type='csv', vocabulary=filename)
+    dispatcher: IdTaggedFramePerGroupDispatcher = IdTaggedFramePerGroupDispatcher(
+        target=f'tests/output/{str(uuid.uuid4())[:8]}', opts=opts
+    )
+
+    ids: np.ndarray = dispatcher.encode(pd.Series(['a', np.nan, 'nan', None, '', 'a']))
+    assert ids.tolist() == [0, 1, 2, 1, 1, 0]
+
+    dispatcher.vocabulary.save()
+    assert list(Vocabulary.load(filename).token2id.items()) == [('a', 0), ('', 1), ('nan', 2)]
+
+
+def test_stored_tokens_are_looked_up_without_loading_them_as_dict():
+    filename: str = vocabulary_filename()
+    vocabulary: Vocabulary = Vocabulary(filename)
+    _ = vocabulary['a'], vocabulary['b']
+    vocabulary.save()
+
+    vocabulary = Vocabulary.load(filename)
+    assert len(vocabulary.added) == 0
+    assert vocabulary.encode(['b', 'c', 'a', 'd']).tolist() == [1, 2, 0, 3]
+    assert list(vocabulary.added) == ['c', 'd']
+    assert vocabulary.tokens(1) == ['b', 'c', 'd']
+
+
+def test_vocabulary_with_duplicate_tokens_is_refused():
+    filename: str = vocabulary_filename()
+    with open(f'{filename}.strings', 'wb') as fp:
+        fp.write(b'aa')
+    with open(f'{filename}.offsets', 'wb') as fp:
+        fp.write(np.array([0, 1, 2], dtype=np.int64).tobytes())
+
+    with pytest.raises(ValueError, match="duplicate"):
+        _ = Vocabulary.load(filename)['a']
+
+
+def test_empty_vocabulary_is_loaded_if_not_stored():
+    vocabulary: Vocabulary = Vocabulary.load(vocabulary_filename())
+    assert len(vocabulary) == 0
+    assert vocabulary['a'] == 0
+
+
+def test_dispatch_with_persistent_vocabulary_keeps_ids_between_runs():
+    filename: str = vocabulary_filename()
+    opts: DispatchOptions = DispatchOptions(compress_type='csv', skip_text=False, vocabulary=filename)
+    issues: list[tuple[str, pd.DataFrame]] = create_issues(6)
+
+    first: str = tag_sample_corpus(source=pd.concat([x[1] for x in issues[:3]]), dispatch_opts=opts)
+    first_vocabulary: pd.DataFrame = pd.read_csv(os.path.join(first, 'token2id.csv'), sep='\t', index_col=0)
+    assert Vocabulary.load(filename).read_strings().to_pylist() == first_vocabulary.token.fillna('').tolist()
+
+    second: str = tag_sample_corpus(source=pd.concat([x[1] for x in issues[3:]]), dispatch_opts=opts)
+    second_vocabulary: pd.DataFrame = pd.read_csv(os.path.join(second, 'token2id.csv'), sep='\t', index_col=0)
+
+    pd.testing.assert_frame_equal(second_vocabulary.iloc[: len(first_vocabulary)], first_vocabulary)
+    assert len(Vocabulary.load(filename)) == len(second_vocabulary)
+
+    dispatcher: IdTaggedFramePerGroupDispatcher = IdTaggedFramePerGroupDispatcher(target=second, opts=opts)
+    assert list(dispatcher.token2id.items()) == list(Vocabulary.load(filename).token2id.items())